@@ -5,6 +5,10 @@ set -o errexit
 
 pip install -r requirements.txt
 
+# Self-host the web fonts (skipped when already vendored). If Google Fonts is slow or down the
+# build goes on and pages link the Google stylesheet instead
+python manage.py vendor_fonts --allow-fallback
+
 python manage.py collectstatic --noinput
 
 # Run migrations automatically during build
@@ -0,0 +1,122 @@
+"""
+gunicorn settings, loaded automatically from the working directory by `gunicorn mysite.wsgi`.
+
+Defaults are sized from the container's CPU quota and memory limit; override any of them with
+WEB_CONCURRENCY (workers), GUNICORN_THREADS, GUNICORN_WORKER_CLASS (gthread or sync),
+GUNICORN_PRELOAD, GUNICORN_MAX_REQUESTS and GUNICORN_TIMEOUT.
+"""
+import gc
+import math
+import os
+import shutil
+
+# Memory budgeted per worker: ~45 MB RSS after a loadtest run with preload, plus headroom
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', '64'))
+
+
+def cpu_limit():
+    """CPUs this container may use: the cgroup quota if there is one, else the visible cores"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def memory_limit_mb():
+    """Memory this container may use: the cgroup limit if there is one, else physical RAM"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:  # cgroup v1 reports "unlimited" as a huge number
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# gthread by default: signup and the email paths mostly wait on Neon and SMTP, so a few threads
+# per process serve more concurrent requests than extra processes would, for much less memory
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY') or max(1, min(
+    2 * cpu_limit() + 1,
+    memory_limit_mb() // WORKER_MEMORY_MB - 1,  # Leave one worker's worth for the master and spikes
+)))
+threads = int(os.environ.get('GUNICORN_THREADS', '4' if worker_class == 'gthread' else '1'))
+
+# Import Django once in the master so workers share its memory copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Recycle workers to cap slow leaks; jitter keeps them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+errorlog = '-'
+
+# Heartbeat files on tmpfs, so a slow container disk can't make the master kill healthy workers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Per-worker Prometheus metric files (see landing.metrics). Set before the app is preloaded and
+# emptied here, in the master, so samples from the previous boot don't linger.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/aigis-prometheus')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def warm_up():
+    """Compile the public templates, build the URL resolver and the email Bloom filter before the first request needs them"""
+    from django.db import connections
+    from django.template.loader import get_template
+    from django.urls import resolve, reverse
+
+    from landing.bloom import email_registry
+
+    reverse('home')  # Builds the reverse lookup tables
+    resolve('/signup/')  # Imports the URLconf and views
+    for name in ('landing/index.html', 'landing/signup.html', 'landing/success.html',
+                 'landing/privacy.html', 'landing/terms.html'):
+        get_template(name)
+
+    try:
+        email_registry.ensure_built()  # No-op in workers that inherited the master's filter
+    except Exception as e:
+        # Database asleep or down: every check is a "maybe" (a database query) until it is built
+        print(f'Email Bloom filter not built: {e}')
+    finally:
+        connections.close_all()  # Don't hold a connection open in the master
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Warm in the master so every worker inherits the compiled templates, then move everything
+        # allocated so far out of the GC's reach: collections would otherwise touch (and copy) the
+        # shared pages in each worker
+        warm_up()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        # Connections opened in the master while preloading must not be shared between processes
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    # Runs once the worker has loaded the app (without preload, post_fork is too early for Django)
+    warm_up()  # No-op when the master already warmed up
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils.html import format_html
-from .models import UserProfile
+from . import jobs
+from .models import Job, UserProfile, AnalyticsEvent, WaitlistEntry
 
 
 # Inline for UserProfile in User admin
@@ -22,6 +26,18 @@ class UserProfileInline(admin.StackedInline):
         return qs
 
 
+def enqueue_job(model_admin, request, kind, **params):
+    """
+    Bulk actions run in `manage.py run_jobs`, not in the request: on large tables they used to
+    hit gunicorn's timeout and stop halfway. Queue the job and point the admin at its progress.
+    """
+    job = jobs.enqueue(kind, created_by=request.user, **params)
+    model_admin.message_user(request, format_html(
+        'Queued job #{}: {}. <a href="{}">Follow its progress</a>.',
+        job.pk, jobs.KINDS[kind].label, reverse('admin:landing_job_change', args=[job.pk]),
+    ))
+
+
 # Unregister the default User admin and register our custom one
 admin.site.unregister(User)
 
@@ -37,9 +53,9 @@ class CustomUserAdmin(BaseUserAdmin):
     def get_queryset(self, request):
         """Optimize queryset and handle users without profiles safely"""
         qs = super().get_queryset(request)
-        # Use select_related for OneToOne - but it will fail if profile doesn't exist
-        # So we don't use it and handle DoesNotExist in the methods instead
-        return qs
+        # LEFT OUTER JOIN: users without a profile still show up, and obj.profile raises
+        # DoesNotExist from the cache instead of running one query per row (4 per row before)
+        return qs.select_related('profile')
     
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -58,14 +74,12 @@ class CustomUserAdmin(BaseUserAdmin):
     )
     
     def has_profile(self, obj):
+        # boolean=True renders the admin's yes/no icon, which needs a real bool (HTML raised KeyError)
         try:
-            # Use try/except for DoesNotExist
             obj.profile
-            return format_html('<span style="color: #00FF8C;">✓ Yes</span>')
+            return True
         except (UserProfile.DoesNotExist, AttributeError):
-            return format_html('<span style="color: #fca5a5;">✗ No</span>')
-        except:
-            return format_html('<span style="color: #fca5a5;">✗ No</span>')
+            return False
     has_profile.short_description = 'Has Profile'
     has_profile.boolean = True
     
@@ -100,65 +114,18 @@ class CustomUserAdmin(BaseUserAdmin):
     actions = ['delete_all_users_action', 'create_missing_profiles', 'delete_orphaned_users']
     
     def delete_orphaned_users(self, request, queryset):
-        """Delete users who don't have profiles (orphaned users)"""
-        from django.contrib.auth.models import User
-        
-        # Find users without profiles (excluding superusers)
-        # Get all user IDs that have profiles
-        users_with_profiles = set(UserProfile.objects.values_list('user_id', flat=True))
-        
-        # Find orphaned users (no profile, not superuser)
-        all_users = User.objects.filter(is_superuser=False)
-        orphaned_users = [user for user in all_users if user.id not in users_with_profiles]
-        
-        count = len(orphaned_users)
-        if count > 0:
-            # Delete orphaned users
-            deleted = User.objects.filter(id__in=[u.id for u in orphaned_users]).delete()
-            deleted_count = deleted[0] if isinstance(deleted, tuple) else count
-            self.message_user(request, f"Deleted {deleted_count} orphaned user(s) without profiles.")
-        else:
-            self.message_user(request, "No orphaned users found (all users have profiles or are superusers).")
+        """Delete users who don't have profiles (orphaned users), in a background job"""
+        enqueue_job(self, request, 'delete_orphaned_users')
     delete_orphaned_users.short_description = "Delete orphaned users (users without profiles)"
     
     def create_missing_profiles(self, request, queryset):
-        """Create UserProfile for users who don't have one"""
-        created = 0
-        for user in queryset:
-            if not hasattr(user, 'profile'):
-                UserProfile.objects.create(
-                    user=user,
-                    full_name=user.email.split('@')[0],  # Use email prefix as default name
-                    phone='',
-                    shield_limit_percent=10
-                )
-                created += 1
-        
-        self.message_user(request, f"Created {created} profile(s) for users without profiles.")
+        """Create UserProfile for selected users who don't have one, in a background job"""
+        enqueue_job(self, request, 'create_missing_profiles', user_ids=list(queryset.values_list('pk', flat=True)))
     create_missing_profiles.short_description = "Create profiles for selected users (if missing)"
     
     def delete_all_users_action(self, request, queryset):
-        """Delete ALL users and profiles - USE WITH CAUTION!"""
-        from django.contrib.auth.models import User
-        from .models import UserProfile
-        
-        total_users_before = User.objects.count()
-        total_profiles_before = UserProfile.objects.count()
-        
-        # Delete all regular users (this will cascade delete profiles)
-        # First delete profiles explicitly, then users
-        UserProfile.objects.all().delete()
-        result = User.objects.filter(is_superuser=False).delete()
-        deleted_count = result[0] if isinstance(result, tuple) else 0
-        
-        remaining_users = User.objects.count()
-        
-        self.message_user(
-            request,
-            f"Deleted {deleted_count} regular user(s) and {total_profiles_before} profile(s). "
-            f"{remaining_users} user(s) remain (superusers preserved).",
-            level='warning'
-        )
+        """Delete ALL users and profiles - USE WITH CAUTION! Runs as a background job"""
+        enqueue_job(self, request, 'delete_all_users')
     delete_all_users_action.short_description = "⚠️ DELETE ALL REGULAR USERS (keeps superusers)"
 
 
@@ -224,66 +191,18 @@ class UserProfileAdmin(admin.ModelAdmin):
     actions = ['export_selected_profiles', 'delete_selected', 'delete_all_users', 'delete_all_orphaned_users']
     
     def delete_all_orphaned_users(self, request, queryset):
-        """Delete ALL users without profiles (orphaned users) - works on any queryset"""
-        from django.contrib.auth.models import User
-        
-        # Find all users that don't have profiles (excluding superusers)
-        users_with_profiles = set(UserProfile.objects.values_list('user_id', flat=True))
-        all_users = User.objects.filter(is_superuser=False)
-        orphaned_users = [u.id for u in all_users if u.id not in users_with_profiles]
-        
-        if orphaned_users:
-            User.objects.filter(id__in=orphaned_users).delete()
-            self.message_user(request, f"Deleted {len(orphaned_users)} orphaned user(s) without profiles.")
-        else:
-            self.message_user(request, "No orphaned users found.")
+        """Delete ALL users without profiles (orphaned users) - works on any queryset; background job"""
+        enqueue_job(self, request, 'delete_orphaned_users')
     delete_all_orphaned_users.short_description = "🗑️ DELETE ALL ORPHANED USERS (no profile)"
     
     def delete_all_users(self, request, queryset):
-        """Delete ALL regular users and profiles - USE WITH CAUTION!"""
-        from django.contrib.auth.models import User
-        
-        total_users_before = User.objects.count()
-        total_profiles_before = UserProfile.objects.count()
-        
-        # Delete all profiles first
-        UserProfile.objects.all().delete()
-        
-        # Then delete all regular users (excluding superusers)
-        regular_users = User.objects.filter(is_superuser=False)
-        result = regular_users.delete()
-        deleted_count = result[0] if isinstance(result, tuple) else regular_users.count()
-        
-        remaining = User.objects.count()
-        
-        self.message_user(
-            request,
-            f"Deleted {deleted_count} regular user(s) and {total_profiles_before} profile(s). {remaining} user(s) remain (superusers).",
-            level='warning'
-        )
+        """Delete ALL regular users and profiles - USE WITH CAUTION! Runs as a background job"""
+        enqueue_job(self, request, 'delete_all_users')
     delete_all_users.short_description = "⚠️ DELETE ALL REGULAR USERS (keeps superusers)"
     
     def export_selected_profiles(self, request, queryset):
-        """Export selected profiles to a simple text format"""
-        import csv
-        from django.http import HttpResponse
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="user_profiles.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Full Name', 'Email', 'Phone', 'Loss Shield %', 'Signup Date'])
-        
-        for profile in queryset:
-            writer.writerow([
-                profile.full_name,
-                profile.user.email,
-                profile.phone or '',
-                profile.shield_limit_percent,
-                profile.user.date_joined.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        return response
+        """Export selected profiles to CSV in a background job; download it from the job's page"""
+        enqueue_job(self, request, 'export_profiles', profile_ids=list(queryset.values_list('pk', flat=True)))
     export_selected_profiles.short_description = "Export selected profiles to CSV"
     
     def delete_selected(self, request, queryset):
@@ -303,3 +222,86 @@ class UserProfileAdmin(admin.ModelAdmin):
         
         self.message_user(request, f"Successfully deleted {count} profile(s) and associated user(s).")
     delete_selected.short_description = "Delete selected profiles (and users)"
+
+
+# Analytics events are append-only (written in batches by the /events/ endpoint)
+@admin.register(AnalyticsEvent)
+class AnalyticsEventAdmin(admin.ModelAdmin):
+    list_display = ('name', 'path', 'client_id', 'created_at')
+    list_filter = ('name', 'created_at')
+    search_fields = ('name', 'path', 'client_id')
+    date_hierarchy = 'created_at'
+    list_per_page = 100
+    readonly_fields = ('name', 'path', 'client_id', 'data', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('email', 'source', 'created_at', 'promoted_at')
+    list_filter = ('promoted_at', 'created_at')
+    search_fields = ('email',)
+    ordering = ('-created_at',)
+    list_per_page = 100
+
+
+# Background jobs queued by the bulk actions above (run by `manage.py run_jobs`)
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'throughput', 'created_by', 'created_at', 'finished_at', 'download')
+    list_filter = ('status', 'kind')
+    ordering = ('-created_at',)
+    list_per_page = 50
+    list_select_related = ('created_by',)
+    readonly_fields = (
+        'kind', 'status', 'progress', 'throughput', 'cursor', 'error', 'download', 'params',
+        'created_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    )
+    exclude = ('processed', 'total', 'run_seconds', 'result_file')
+    actions = ['requeue_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress(self, obj):
+        if not obj.total:
+            return f"{obj.processed} rows"
+        return f"{obj.processed}/{obj.total} rows ({100 * obj.processed // obj.total}%)"
+    progress.short_description = 'Progress'
+
+    def throughput(self, obj):
+        return f"{obj.rows_per_second:.0f} rows/s" if obj.rows_per_second else '-'
+    throughput.short_description = 'Throughput'
+
+    def download(self, obj):
+        if obj.status != Job.DONE or not obj.result_file:
+            return '-'
+        return format_html('<a href="{}">{}</a>', reverse('admin:landing_job_download', args=[obj.pk]), obj.result_file)
+    download.short_description = 'Result'
+
+    def get_urls(self):
+        return [
+            path('<int:object_id>/download/', self.admin_site.admin_view(self.download_view), name='landing_job_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, object_id):
+        job = get_object_or_404(Job, pk=object_id, status=Job.DONE)
+        if not self.has_view_permission(request, job) or not job.result_file:
+            raise Http404
+        try:
+            return FileResponse(open(jobs.result_path(job), 'rb'), as_attachment=True, filename=job.result_file)
+        except FileNotFoundError:
+            raise Http404('The export file is not on this machine (run_jobs writes to JOB_RESULTS_DIR)')
+
+    def requeue_jobs(self, request, queryset):
+        """Failed jobs resume after their last committed chunk"""
+        count = queryset.filter(status=Job.FAILED).update(status=Job.QUEUED, error='', finished_at=None)
+        if count:
+            jobs.wake_workers()
+        self.message_user(request, f"Re-queued {count} failed job(s).")
+    requeue_jobs.short_description = "Re-queue failed jobs (resume where they stopped)"
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class LandingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'landing'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .db.slow_queries import install
+
+        # Every connection, in every thread and process, times its queries for the slow-query log
+        connection_created.connect(install, dispatch_uid='landing.slow_queries')
@@ -0,0 +1,190 @@
+"""
+Per-process Bloom filter of registered emails, for answering "is this email new?" from memory.
+
+A Bloom filter has no false negatives: if an email was added, `email in bloom` is True. So a
+False from EmailRegistry.might_exist() means the email is definitely not registered (as of the
+last refresh) and the existence query can be skipped; True means "maybe" and the caller falls
+through to the indexed database check. At the default 1% error rate that is ~1 in 100 new
+emails, plus the ones that really exist.
+
+The filter is built at gunicorn boot (gunicorn.conf.py warm_up; with preload the workers share
+the master's copy), gets each signup in this process immediately, picks up users created
+elsewhere (other workers, import_users, the signup journal) with a pk query every
+EMAIL_BLOOM_REFRESH_SECONDS, and is rebuilt from scratch every EMAIL_BLOOM_REBUILD_SECONDS to
+forget deleted accounts. Refreshes run in a background thread and only while requests arrive,
+so an idle site doesn't keep Neon awake. Until the first build everything is "maybe".
+
+Primary keys are handed out at INSERT but become visible at COMMIT, so a slow transaction (an
+import_users batch) can commit rows below a pk the last refresh already saw. Each refresh
+therefore re-reads the last EMAIL_BLOOM_REFRESH_OVERLAP pks below the highest one seen as well;
+anything committing later than that is picked up by the next rebuild.
+
+The window between refreshes can let a just-registered email through as "new"; the signup
+view's unique-username handling still rejects it as a duplicate.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count, F, Q
+
+from .metrics import EMAIL_BLOOM_LOOKUPS
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: a bytearray of bits and k positions per item from one digest"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # Distinct items added (an item whose bits were all set already isn't counted)
+
+    def _positions(self, item):
+        # Double hashing (Kirsch-Mitzenmacher): two 64-bit halves of one blake2b digest give all k
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        self.count += new
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _keys(username, email):
+    """Filter keys for one account: its username, and its email when that differs (it usually doesn't)"""
+    keys = [username.lower()]
+    if email and email.lower() != keys[0]:
+        keys.append(email.lower())
+    return keys
+
+
+class EmailRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._filter = None
+        self._max_pk = 0
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._pid = os.getpid()
+        self._added_during_build = None
+
+    @property
+    def ready(self):
+        return self._filter is not None
+
+    def might_exist(self, email):
+        """False: definitely not registered. True: maybe, ask the database (always True before the first build)"""
+        bloom = self._filter
+        if bloom is None:
+            EMAIL_BLOOM_LOOKUPS.labels('cold').inc()
+            return True
+        self._refresh_if_due()
+        if email.lower() in bloom:
+            EMAIL_BLOOM_LOOKUPS.labels('maybe').inc()
+            return True
+        EMAIL_BLOOM_LOOKUPS.labels('negative').inc()
+        return False
+
+    def add(self, email):
+        """Record an account created by this process, so it is never reported as new here"""
+        email = email.lower()
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(email)
+            if self._added_during_build is not None:
+                self._added_during_build.append(email)
+
+    def ensure_built(self):
+        if self._filter is None:
+            self.build()
+
+    def build(self):
+        """Full scan, streamed so memory stays at the size of the filter"""
+        with self._lock:
+            self._added_during_build = []
+        try:
+            users = User.objects.order_by()
+            # Sized from the keys about to go in (see _keys), with room for as many again before the
+            # error rate degrades (refresh rebuilds past that)
+            keys = users.aggregate(
+                accounts=Count('pk'),
+                other_emails=Count('pk', filter=~Q(email='') & ~Q(email__iexact=F('username'))),
+            )
+            capacity = 2 * (keys['accounts'] + keys['other_emails'])
+            bloom = BloomFilter(max(settings.EMAIL_BLOOM_CAPACITY, capacity), settings.EMAIL_BLOOM_ERROR_RATE)
+            max_pk = 0
+            for pk, username, email in users.values_list('pk', 'username', 'email').iterator(chunk_size=5000):
+                for key in _keys(username, email):
+                    bloom.add(key)
+                max_pk = max(max_pk, pk)
+            with self._lock:
+                for email in self._added_during_build:
+                    bloom.add(email)
+                self._filter = bloom
+                self._max_pk = max_pk
+                self._built_at = self._checked_at = time.monotonic()
+        finally:
+            self._added_during_build = None
+
+    def refresh(self):
+        """Add users created since the last scan; rebuild when due or when the filter is over capacity"""
+        bloom = self._filter
+        if bloom is None or bloom.count > bloom.capacity or time.monotonic() - self._built_at > settings.EMAIL_BLOOM_REBUILD_SECONDS:
+            self.build()
+            return
+        # The overlap catches rows with lower pks that committed after the last scan (re-adding is a no-op)
+        since = max(0, self._max_pk - settings.EMAIL_BLOOM_REFRESH_OVERLAP)
+        rows = list(User.objects.filter(pk__gt=since).order_by('pk').values_list('pk', 'username', 'email'))
+        with self._lock:
+            for pk, username, email in rows:
+                for key in _keys(username, email):
+                    bloom.add(key)
+                self._max_pk = max(self._max_pk, pk)
+            self._checked_at = time.monotonic()
+
+    def _refresh_if_due(self):
+        if self._pid != os.getpid():
+            # Forked from the master after the boot build: its refresh thread didn't come along
+            self._pid = os.getpid()
+            self._refreshing = False
+        if self._refreshing or time.monotonic() - self._checked_at < settings.EMAIL_BLOOM_REFRESH_SECONDS:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, name='email-bloom-refresh', daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            self._checked_at = time.monotonic()  # Database unavailable: keep the old filter, try again later
+        finally:
+            self._refreshing = False
+            # This thread's connection is never closed by request_finished, so don't hold it open
+            connections.close_all()
+
+
+email_registry = EmailRegistry()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker around a dependency that can disappear (a suspended Neon database).
+
+    Closed: calls go through. After failure_threshold failures in a row it opens and allow()
+    returns False for reset_timeout seconds, so callers take their fallback path instantly
+    instead of waiting out a connect timeout each. Then it lets a single probe through
+    (half-open): a success closes it again and runs on_close, a failure restarts the wait. A
+    probe that ends without either (an invalid form never reaches the database) must call
+    release(), so the next request probes instead of the breaker staying half-open.
+    """
+
+    def __init__(self, failure_threshold=2, reset_timeout=15.0, on_close=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_close = on_close
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._probe_at = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        return 'half-open' if self._probing else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            # A probe that never reported back (its request died) is replaced after reset_timeout too
+            started = self._probe_at if self._probing else self._opened_at
+            if now - started < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_at = now
+            return True
+
+    def release(self):
+        """End a probe that had no database outcome; a no-op unless half-open"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            was_open = self._opened_at is not None
+            self.reset()
+        if was_open and self.on_close:
+            self.on_close()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
@@ -0,0 +1,97 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """
+    Per-process, append-only write buffer for a model.
+
+    add() only appends to an in-memory list; a daemon thread inserts the pending rows with one
+    bulk_create when the buffer reaches max_size rows or the oldest row is max_age seconds old,
+    and whatever is left is flushed at interpreter exit. If key is given, rows with the same key
+    are collapsed in the buffer (the first one wins) and ignore_conflicts lets the database drop
+    rows already stored by an earlier flush or another worker.
+
+    A crash loses at most one buffer's worth of rows, so only use this for data where that
+    trade-off is acceptable (analytics, waitlist capture), never for accounts.
+    """
+
+    def __init__(self, model, max_size=200, max_age=5.0, max_pending=10000, key=None, ignore_conflicts=False):
+        self.model = model
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.key = key
+        self.ignore_conflicts = ignore_conflicts
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        # Also called after a fork: the parent's rows and flusher thread don't belong to this process
+        self._pid = os.getpid()
+        self._pending = {}
+        self._oldest = None
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, obj):
+        """Queue obj for insertion; returns False if it was a duplicate or the buffer is full"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            key = self.key(obj) if self.key else id(obj)
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending[key] = obj
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.model.__name__}-flusher', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_size:
+                self._wake.set()
+        return True
+
+    def flush(self):
+        """Insert everything pending in one bulk_create; returns the number of rows sent"""
+        with self._lock:
+            if self._pid != os.getpid() or not self._pending:
+                return 0
+            batch = list(self._pending.values())
+            self._pending = {}
+            self._oldest = None
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.max_size, ignore_conflicts=self.ignore_conflicts)
+        except Exception as e:
+            logger.error(f'Failed to flush {len(batch)} {self.model.__name__} row(s): {e}')
+            # Put the rows back (newer rows win on key clashes) so the next flush retries them
+            with self._lock:
+                restored = {(self.key(obj) if self.key else id(obj)): obj for obj in batch}
+                restored.update(self._pending)
+                self._pending = dict(list(restored.items())[-self.max_pending:])
+                self._oldest = self._oldest or time.monotonic()
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=self.max_age)
+            self._wake.clear()
+            oldest = self._oldest
+            if oldest is None:
+                continue
+            if len(self._pending) >= self.max_size or time.monotonic() - oldest >= self.max_age:
+                self.flush()
+                # This thread's connection is never closed by request_finished, so don't hold it open
+                connections.close_all()
@@ -0,0 +1,17 @@
+"""
+Database backends that wrap Django's own to time connection setup (see landing.metrics).
+
+Set ENGINE to landing.db.postgresql or landing.db.sqlite3 instead of django.db.backends.*.
+"""
+import time
+
+from landing.metrics import DB_CONNECT_LATENCY
+
+
+class TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            DB_CONNECT_LATENCY.labels(self.alias).observe(time.perf_counter() - start)
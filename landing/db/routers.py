@@ -0,0 +1,82 @@
+"""
+Read-replica routing.
+
+With REPLICA_DATABASE_URL set, settings.DATABASES gets a 'replica' alias. Reads go there only
+inside use_replica() (ReplicaMiddleware wraps admin GET pages in it; the profile CSV export and
+the metrics queue stats use it directly), and only until the first write in the same request or
+block, so code that writes and then reads sees its own write. Everything else, and everything
+when no replica is configured, uses default.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+_current = ContextVar('landing_replica_state', default=None)
+
+
+class ReplicaState:
+    def __init__(self):
+        self.reads = False  # Route reads to the replica
+        self.wrote = False  # Something was written: stay on default from here on
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def current():
+    return _current.get()
+
+
+def activate():
+    """Fresh state for one request (ReplicaMiddleware); returns the token for deactivate()"""
+    return _current.set(ReplicaState())
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Send the reads in this block to the replica, unless this request or block already wrote"""
+    state = _current.get()
+    token = None
+    if state is None:
+        state = ReplicaState()
+        token = _current.set(state)
+    previous = state.reads
+    state.reads = True
+    try:
+        yield state
+    finally:
+        state.reads = previous
+        if token is not None:
+            _current.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is not None and state.reads and not state.wrote and replica_configured():
+            return REPLICA
+        # Explicit, so relations of rows read from the replica don't follow them there
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        # Explicit, so saving a row that was read from the replica still writes to default
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Same data on both aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
@@ -0,0 +1,187 @@
+"""
+Slow-query log.
+
+Every database connection gets an execute wrapper (installed from the connection_created
+signal, see LandingConfig.ready) that times each query. Queries slower than SLOW_QUERY_MS are
+appended as one JSON line to SLOW_QUERY_LOG_PATH with their fingerprint (the SQL with literals,
+parameters and IN/VALUES lists collapsed, so the same ORM call always gets the same one), the
+view or command that ran them, and the duration. On PostgreSQL the first occurrence of each
+fingerprint in a process also records its `EXPLAIN (ANALYZE off, FORMAT JSON)` plan; EXPLAIN
+without ANALYZE plans the statement but doesn't run it.
+
+The file is shared by all processes (gunicorn workers, run_jobs, commands); `manage.py
+slow_queries` aggregates it per fingerprint and points out sequential scans in the plans.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from landing.metrics import SLOW_QUERIES
+
+logger = logging.getLogger(__name__)
+
+_source = ContextVar('landing_query_source', default=None)
+_explaining = ContextVar('landing_query_explaining', default=False)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) "?\w+"?', re.IGNORECASE), r'\1 ?'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\bIN \(\?(?:, ?\?)*\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'(\(\?(?:, ?\?)*\))(?:, ?\(\?(?:, ?\?)*\))+'), r'\1, ...'),
+]
+
+
+def normalize(sql):
+    """SQL with every value replaced by ?, so queries that differ only in their values match"""
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def current_source():
+    """The view or command running the query (QuerySourceMiddleware sets it for requests)"""
+    source = _source.get()
+    if source is not None:
+        return source
+    thread = threading.current_thread()
+    if thread is not threading.main_thread():
+        return f'thread:{thread.name}'
+    if len(sys.argv) > 1 and os.path.basename(sys.argv[0]) == 'manage.py':
+        return f'command:{sys.argv[1]}'
+    return 'unknown'
+
+
+def activate(source):
+    return _source.set(source)
+
+
+def deactivate(token):
+    _source.reset(token)
+
+
+@contextmanager
+def query_source(source):
+    token = activate(source)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+class SlowQueryLog:
+    """The execute wrapper; one instance is shared by every connection in the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._explained = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explaining.get():
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - start
+        # Failed queries skip the log: their error is reported elsewhere
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            try:
+                self.record(context['connection'], sql, params, many, elapsed)
+            except Exception as e:
+                logger.warning(f'Could not record slow query: {e}')
+        return result
+
+    def record(self, connection, sql, params, many, elapsed):
+        normalized = normalize(sql)
+        key = fingerprint(normalized)
+        source = current_source()
+        entry = {
+            'at': timezone.now().isoformat(),
+            'fingerprint': key,
+            'sql': normalized,
+            'ms': round(elapsed * 1000, 2),
+            'source': source,
+            'alias': connection.alias,
+        }
+        with self._lock:
+            first = key not in self._explained
+            self._explained.add(key)
+        if first and settings.SLOW_QUERY_EXPLAIN and not many and connection.vendor == 'postgresql' \
+                and normalized.lstrip('(').split(' ', 1)[0].upper() in EXPLAINABLE:
+            entry['explain'] = self.explain(connection, sql, params)
+        SLOW_QUERIES.labels(source.split(':', 1)[0]).inc()
+        line = json.dumps(entry, default=str) + '\n'
+        path = Path(settings.SLOW_QUERY_LOG_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(path, 'a') as f:
+            f.write(line)  # One write per line: appends from several processes don't interleave
+
+    def explain(self, connection, sql, params):
+        token = _explaining.set(True)
+        try:
+            # A savepoint inside transactions, so a failed EXPLAIN can't abort the caller's transaction
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (ANALYZE off, FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            _explaining.reset(token)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def install(sender=None, connection=None, **kwargs):
+    """connection_created receiver: add the wrapper once per connection object"""
+    if settings.SLOW_QUERY_MS and slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, slow_query_log)
+
+
+def read_log(path=None):
+    """Entries from the log file, skipping a torn last line"""
+    path = Path(path or settings.SLOW_QUERY_LOG_PATH)
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def seq_scans(explain):
+    """(table, filter, estimated rows) for every Seq Scan node in an EXPLAIN (FORMAT JSON) plan"""
+    scans = []
+
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan':
+            scans.append((node.get('Relation Name'), node.get('Filter'), node.get('Plan Rows')))
+        for child in node.get('Plans', []):
+            walk(child)
+
+    if isinstance(explain, list):
+        for statement in explain:
+            walk(statement.get('Plan', {}))
+    return scans
@@ -0,0 +1,88 @@
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseRedirect
+from django.utils.cache import patch_cache_control
+
+IDEMPOTENCY_FIELD = 'idempotency_key'
+IDEMPOTENCY_PENDING = 'pending'
+VALID_IDEMPOTENCY_KEY = re.compile(r'^[\w-]{16,64}$')
+
+
+def public_cache(view_func):
+    """
+    Let browsers and a CDN cache an anonymous page: fresh for PUBLIC_CACHE_SECONDS, then served
+    stale for up to PUBLIC_CACHE_STALE_SECONDS while the edge revalidates in the background.
+
+    Only for views that render nothing per visitor (no user, messages or CSRF token);
+    PublicCacheMiddleware drops the Vary: Cookie such views don't need.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code == 200:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.PUBLIC_CACHE_SECONDS,
+                stale_while_revalidate=settings.PUBLIC_CACHE_STALE_SECONDS,
+                stale_if_error=settings.PUBLIC_CACHE_STALE_SECONDS,
+            )
+        return response
+    return wrapper
+
+
+def idempotent_post(view_func):
+    """
+    Answer repeats of a form POST (double clicks, retries after a timeout) with the first one's
+    redirect instead of running the view again.
+
+    The form carries a key that is new on every render ({% idempotency_field %}). The first POST
+    with a key claims it in the cache; if the view redirects, the redirect is stored under the
+    key for IDEMPOTENCY_SECONDS, otherwise (form errors) the key is released. A repeat that
+    arrives while the first is still running waits up to IDEMPOTENCY_WAIT_SECONDS for its
+    outcome. POSTs without a valid key run the view as before.
+
+    Uses the default cache, so with the per-process LocMemCache only repeats that reach the
+    same worker are absorbed; point CACHE_BACKEND at a shared cache to cover all of them.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.POST.get(IDEMPOTENCY_FIELD, '') if request.method == 'POST' else ''
+        if not VALID_IDEMPOTENCY_KEY.match(key):
+            return view_func(request, *args, **kwargs)
+
+        cache_key = f'idempotency:{request.path}:{key}'
+        if not cache.add(cache_key, IDEMPOTENCY_PENDING, settings.IDEMPOTENCY_SECONDS):
+            location = _await_outcome(cache_key)
+            if location is not None:
+                return HttpResponseRedirect(location)
+            # The first attempt failed or is taking too long: handle this one normally
+            cache.set(cache_key, IDEMPOTENCY_PENDING, settings.IDEMPOTENCY_SECONDS)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+        if response.status_code in (301, 302, 303):
+            cache.set(cache_key, response['Location'], settings.IDEMPOTENCY_SECONDS)
+        else:
+            cache.delete(cache_key)
+        return response
+    return wrapper
+
+
+def _await_outcome(cache_key):
+    """The stored redirect for the key, once the request that claimed it finishes; None if it didn't redirect"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        outcome = cache.get(cache_key)
+        if outcome != IDEMPOTENCY_PENDING:
+            return outcome
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
@@ -0,0 +1,105 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import SMTP_SEND_LATENCY
+from .models import PendingEmail
+
+
+def build_message(pending_email, connection=None):
+    """The EmailMessage for one queued PendingEmail (welcome or admin_notification)"""
+    email_data = pending_email.email_data
+
+    if pending_email.email_type == 'welcome':
+        msg = EmailMultiAlternatives(
+            subject=email_data['subject'],
+            body=email_data['text_content'],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email_data['to']],
+            connection=connection,
+        )
+        msg.attach_alternative(email_data['html_content'], "text/html")
+        return msg
+
+    elif pending_email.email_type == 'admin_notification':
+        # What send_mail() builds
+        return EmailMessage(
+            subject=email_data['subject'],
+            body=email_data['message'],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email_data['to']],
+            connection=connection,
+        )
+
+
+def send_pending_emails(pending_emails):
+    """
+    Send a batch of queued PendingEmails; returns [(pending_email, exception or None)] in order.
+
+    With the AsyncSMTPBackend the whole batch is in flight at once over its session pool;
+    other backends send one message at a time over a single connection. A row whose message
+    can't be built (missing data, a deleted user) fails on its own instead of sinking the batch.
+    """
+    connection = get_connection()
+    batch, build_errors = [], {}
+    for pending_email in pending_emails:
+        try:
+            msg = build_message(pending_email, connection)
+        except Exception as e:
+            msg, build_errors[pending_email.pk] = None, e
+        batch.append((pending_email, msg))
+    messages = [msg for _, msg in batch if msg is not None]
+
+    if hasattr(connection, 'send_each'):
+        outcomes = iter(connection.send_each(messages))
+    else:
+        outcomes = iter(_send_sequentially(connection, messages))
+
+    results = []
+    for pending_email, msg in batch:
+        error, seconds = next(outcomes) if msg is not None else (build_errors.get(pending_email.pk), 0.0)
+        SMTP_SEND_LATENCY.labels(
+            email_type=pending_email.email_type, outcome='error' if error else 'ok',
+        ).observe(seconds)
+        results.append((pending_email, error))
+    return results
+
+
+def _send_sequentially(connection, messages):
+    with connection:
+        for msg in messages:
+            start = time.perf_counter()
+            try:
+                connection.send_messages([msg])
+                error = None
+            except Exception as e:
+                error = e
+            yield error, time.perf_counter() - start
+
+
+def deliver_pending_emails(pending_emails, chunk_size, on_result=None):
+    """
+    Send queued PendingEmails chunk_size at a time and record each chunk's outcome before the
+    next one goes out, so a crash part way only re-sends the chunk in flight. Sent rows are
+    marked sent, failed ones get attempts + 1 and stay queued. Calls on_result(pending_email,
+    error) per row; returns (sent, failed) counts.
+    """
+    pending_emails = list(pending_emails)
+    sent_count = failed_count = 0
+    for start in range(0, len(pending_emails), max(1, chunk_size)):
+        sent_ids, failed_ids = [], []
+        for pending_email, error in send_pending_emails(pending_emails[start:start + chunk_size]):
+            (sent_ids if error is None else failed_ids).append(pending_email.id)
+            if on_result:
+                on_result(pending_email, error)
+        # Two UPDATEs per chunk instead of one save() per email
+        if sent_ids:
+            PendingEmail.objects.filter(id__in=sent_ids).update(sent=True, sent_at=timezone.now())
+        if failed_ids:
+            PendingEmail.objects.filter(id__in=failed_ids).update(attempts=F('attempts') + 1)
+        sent_count += len(sent_ids)
+        failed_count += len(failed_ids)
+    return sent_count, failed_count
@@ -1,8 +1,11 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 import re
 
+from .bloom import email_registry
+
 
 PASSWORD_REGEX = re.compile(r"^(?=.*[A-Z])(?=.*\d).{8,}$")
 
@@ -14,6 +17,14 @@ class SignupForm(forms.Form):
     phone = forms.CharField(label="Phone (10 digits)", max_length=10, required=False)
     shield_limit_percent = forms.IntegerField(label="Shield limit (%)", min_value=5, max_value=20, initial=10)
 
+    def __init__(self, *args, check_existing=True, **kwargs):
+        # Bulk callers (import_users) pass check_existing=False and check a whole batch in one query;
+        # the signup view does too while its database circuit breaker is open
+        self.check_existing = check_existing
+        self.database_error = None
+        self.database_reached = False  # The existence query got an answer from the database
+        super().__init__(*args, **kwargs)
+
     def clean_password(self):
         password = self.cleaned_data["password"]
         if not PASSWORD_REGEX.match(password):
@@ -28,14 +39,32 @@ class SignupForm(forms.Form):
 
     def clean_email(self):
         email = self.cleaned_data["email"].lower()
+        if not self.check_existing:
+            return email
+        if not email_registry.might_exist(email):
+            # Definitely new per the in-memory filter; the unique username still catches a race
+            return email
         try:
-            if User.objects.filter(email=email).exists():
-                raise ValidationError("An account with this email already exists.")
+            # Accounts are keyed by email in both username and email, so one query covers both
+            exists = User.objects.filter(Q(username=email) | Q(email=email)).exists()
+            self.database_reached = True
         except Exception as e:
             # If database connection fails, log but don't block form rendering
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Database error checking email: {e}")
+            self.database_error = e  # The signup view journals instead of trying the database again
             # Allow the form to proceed - will be caught on submit
+            return email
+        if exists:
+            # Raised outside the try so the except above can't swallow it
+            raise ValidationError("An account with this email already exists.", code="duplicate")
         return email
 
+
+class WaitlistForm(forms.Form):
+    email = forms.EmailField()
+
+    def clean_email(self):
+        # No existence check here - duplicates are dropped by the waitlist buffer and the unique index
+        return self.cleaned_data["email"].lower()
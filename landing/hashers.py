@@ -0,0 +1,12 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .instrumentation import timed
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """Django's default hasher (same algorithm name, fully compatible) with its cost in request timings"""
+
+    # verify() goes through encode(), so timing encode() covers both signup and login
+    def encode(self, password, salt, iterations=None):
+        with timed('hash'):
+            return super().encode(password, salt, iterations)
@@ -0,0 +1,71 @@
+"""
+Per-request timing collection.
+
+PerformanceMiddleware installs a RequestTimings for sampled requests; instrumented code paths
+(DB execute wrapper, template backend, password hasher, streamed bodies) add to it through
+record()/timed(). Outside a sampled request these helpers cost a context variable lookup.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('landing_request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated duration (seconds) and call count per metric name"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def ms(self, name):
+        return round(self.durations.get(name, 0.0) * 1000, 2)
+
+
+def current():
+    return _current.get()
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def record(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def timed(name):
+    if _current.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed_iter(name, iterable):
+    """Yield from iterable, recording the time spent producing each item under name"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record(name, time.perf_counter() - start)
+            return
+        record(name, time.perf_counter() - start)
+        yield item
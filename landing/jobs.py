@@ -0,0 +1,238 @@
+"""
+DB-backed queue for admin bulk actions that are too slow for one request.
+
+The admin actions enqueue a Job and return at once; `manage.py run_jobs` claims queued jobs
+with SELECT ... FOR UPDATE SKIP LOCKED (two workers never get the same job) and works through
+the job's rows in primary key order, chunk_size at a time. Each chunk commits its changes in
+the same transaction as the job's cursor, progress and heartbeat, so a worker that dies loses
+at most the chunk in flight: a running job whose heartbeat is older than JOB_STALE_SECONDS is
+claimed again and resumes after the cursor.
+
+Exports append CSV rows to a file under JOB_RESULTS_DIR and record its committed length with
+each chunk; a resumed export first truncates the file back to that length.
+"""
+import csv
+import io
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .db.routers import use_replica
+from .models import Job, UserProfile
+
+
+class JobKind:
+    """One kind of job: which rows it walks (queryset) and what it does to a chunk of their pks"""
+    label = ''
+
+    def queryset(self, job):
+        raise NotImplementedError
+
+    def prepare(self, job):
+        """Called before the first chunk of every run, including resumed ones"""
+
+    def process(self, job, pks):
+        raise NotImplementedError
+
+
+class DeleteAllUsers(JobKind):
+    label = 'Delete all regular users (keeps superusers)'
+
+    def queryset(self, job):
+        return User.objects.filter(is_superuser=False)
+
+    def process(self, job, pks):
+        # Profiles first (they have foreign keys to User), then the users and their other rows
+        UserProfile.objects.filter(user_id__in=pks).delete()
+        User.objects.filter(pk__in=pks).delete()
+
+
+class DeleteOrphanedUsers(JobKind):
+    label = 'Delete users without profiles'
+
+    def queryset(self, job):
+        return User.objects.filter(is_superuser=False, profile__isnull=True)
+
+    def process(self, job, pks):
+        # Checked again: a profile may have been created since the chunk was read
+        User.objects.filter(pk__in=pks, profile__isnull=True).delete()
+
+
+class CreateMissingProfiles(JobKind):
+    label = 'Create missing profiles'
+
+    def queryset(self, job):
+        return User.objects.filter(pk__in=job.params.get('user_ids', []), profile__isnull=True)
+
+    def process(self, job, pks):
+        users = User.objects.filter(pk__in=pks, profile__isnull=True).only('pk', 'email')
+        UserProfile.objects.bulk_create([
+            # Email prefix as the default name, as the old inline action did
+            UserProfile(user=user, full_name=user.email.split('@')[0], phone='', shield_limit_percent=10)
+            for user in users
+        ], ignore_conflicts=True)
+
+
+class ExportProfiles(JobKind):
+    label = 'Export profiles to CSV'
+    HEADER = ['Full Name', 'Email', 'Phone', 'Loss Shield %', 'Signup Date']
+
+    def queryset(self, job):
+        profile_ids = job.params.get('profile_ids')
+        queryset = UserProfile.objects.all()
+        return queryset if profile_ids is None else queryset.filter(pk__in=profile_ids)
+
+    def prepare(self, job):
+        if not job.result_file:
+            job.result_file = f'job-{job.pk}-profiles.csv'
+            job.params['offset'] = 0
+        path = result_path(job)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'ab') as f:
+            # Drop anything written after the last committed chunk (a crash between write and commit)
+            f.truncate(job.params['offset'])
+            if not job.params['offset']:
+                header = self.encode([self.HEADER])
+                f.write(header)
+                job.params['offset'] = len(header)
+
+    def process(self, job, pks):
+        # A read-only report: off the primary when a replica is configured
+        with use_replica():
+            profiles = {profile.pk: profile for profile in UserProfile.objects.filter(pk__in=pks).select_related('user')}
+        missing = [pk for pk in pks if pk not in profiles]
+        if missing:
+            # The chunk's pks came from the primary; rows the replica hasn't caught up on are read there
+            profiles.update(
+                (profile.pk, profile)
+                for profile in UserProfile.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=missing).select_related('user')
+            )
+        profiles = [profiles[pk] for pk in sorted(profiles)]
+        rows = [
+            [
+                profile.full_name,
+                profile.user.email,
+                profile.phone or '',
+                profile.shield_limit_percent,
+                profile.user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
+            ]
+            for profile in profiles
+        ]
+        with open(result_path(job), 'ab') as f:
+            f.write(self.encode(rows))
+            f.flush()
+            os.fsync(f.fileno())
+            job.params['offset'] = os.fstat(f.fileno()).st_size
+
+    def encode(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+
+KINDS = {
+    'delete_all_users': DeleteAllUsers(),
+    'delete_orphaned_users': DeleteOrphanedUsers(),
+    'create_missing_profiles': CreateMissingProfiles(),
+    'export_profiles': ExportProfiles(),
+}
+
+
+def result_path(job):
+    return Path(settings.JOB_RESULTS_DIR) / job.result_file
+
+
+def wake_file():
+    return Path(settings.JOB_RESULTS_DIR) / '.wake'
+
+
+def enqueue(kind, created_by=None, **params):
+    """Queue a job and nudge a worker on this machine; returns the Job"""
+    job = Job.objects.create(kind=kind, params=params, created_by=created_by)
+    wake_workers()
+    return job
+
+
+def wake_workers():
+    """run_jobs watches this file between its (rare) database polls"""
+    try:
+        path = wake_file()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    except OSError:
+        pass  # The worker's periodic poll still finds the job
+
+
+def claim_job(stale_seconds=None):
+    """Lock and mark running the oldest queued (or abandoned) job; None if there is none"""
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=stale_seconds or settings.JOB_STALE_SECONDS)
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.QUEUED) | Q(status=Job.RUNNING, heartbeat_at__lt=stale_before))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        job.error = ''
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'error'])
+    return job
+
+
+def run_job(job, chunk_size=None, should_stop=None, on_chunk=None):
+    """
+    Process a claimed job until it is done, fails or should_stop() returns True (it is then
+    re-queued to resume after its cursor). Returns the job with its final status.
+    """
+    kind = KINDS[job.kind]
+    chunk_size = chunk_size or settings.JOB_CHUNK_SIZE
+    fields = ['cursor', 'processed', 'run_seconds', 'heartbeat_at', 'params', 'result_file']
+    try:
+        if job.total is None:
+            job.total = kind.queryset(job).count()
+            job.save(update_fields=['total'])
+        kind.prepare(job)
+        job.save(update_fields=['params', 'result_file'])
+
+        while True:
+            if should_stop and should_stop():
+                job.status = Job.QUEUED
+                job.save(update_fields=['status'])
+                return job
+            start = time.perf_counter()
+            with transaction.atomic():
+                pks = list(kind.queryset(job).filter(pk__gt=job.cursor).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+                if not pks:
+                    break
+                kind.process(job, pks)
+                job.cursor = pks[-1]
+                job.processed += len(pks)
+                job.run_seconds += time.perf_counter() - start
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=fields)
+            if on_chunk:
+                on_chunk(job)
+    except Exception as e:
+        # The cursor stays where the last committed chunk left it: re-queueing resumes from there
+        job.status = Job.FAILED
+        job.error = f'{type(e).__name__}: {e}'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job
+
+    job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return job
@@ -0,0 +1,169 @@
+"""
+Durable local write-behind queue for signups taken while the database is unreachable.
+
+SignupJournal.append() writes one JSON line (password already hashed) under an exclusive
+flock and fsyncs it before the view answers, so a journaled signup survives a worker crash
+or restart on the same disk. replay_signups() later drains the journal into User/UserProfile,
+skipping emails that already have an account; run it with `manage.py replay_signup_journal`
+(start.sh does on boot), and the signup view also starts it when its circuit breaker closes.
+
+Draining renames the journal aside first, so new signups keep appending to a fresh file; an
+interrupted replay leaves the renamed file in place and the next replay picks it up again.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class JournalBusy(Exception):
+    """Another process is already replaying the journal"""
+
+
+class SignupJournal:
+
+    def __init__(self, path=None):
+        self._path = path
+
+    @property
+    def path(self):
+        # Read per call so tests (override_settings) and the command's --path see the current value
+        return str(self._path or settings.SIGNUP_JOURNAL_PATH)
+
+    @property
+    def draining_path(self):
+        return self.path + '.replaying'
+
+    @property
+    def lock_path(self):
+        return self.path + '.lock'
+
+    def has_pending(self):
+        return any(os.path.exists(path) and os.path.getsize(path) for path in (self.path, self.draining_path))
+
+    @contextmanager
+    def _locked(self):
+        """The live journal file, open for appending under an exclusive lock"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(fd).st_ino:
+                break
+            # A replay renamed the file while we waited for the lock; append to the new one instead
+            os.close(fd)
+        try:
+            yield fd
+        finally:
+            os.close(fd)  # Also releases the lock
+
+    def append(self, record):
+        line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+        with self._locked() as fd:
+            os.write(fd, line)
+            os.fsync(fd)
+
+    @contextmanager
+    def draining(self):
+        """
+        Yields the journaled records, oldest first; the drained file is deleted only if the block
+        completes, so a replay that fails halfway is retried from the start (replay is idempotent).
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.lock_path, 'a') as replay_lock:
+            try:
+                fcntl.flock(replay_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise JournalBusy(self.path)
+            if not os.path.exists(self.draining_path) and os.path.exists(self.path):
+                with self._locked():
+                    os.rename(self.path, self.draining_path)
+            if not os.path.exists(self.draining_path):
+                yield []
+                return
+            yield self._read(self.draining_path)
+            os.remove(self.draining_path)
+
+    def _read(self, path):
+        records = []
+        with open(path, 'rb') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Only a write torn by a crash before its fsync can look like this
+                    logger.warning(f'Skipping unreadable signup journal line {path}:{number}')
+        return records
+
+
+def replay_signups(journal):
+    """Create accounts for journaled signups; returns (created, skipped as duplicates)"""
+    created = duplicates = 0
+    with journal.draining() as records:
+        if not records:
+            return created, duplicates
+        emails = {record['email'] for record in records}
+        taken = set()
+        for username, email in User.objects.filter(Q(username__in=emails) | Q(email__in=emails)).values_list('username', 'email'):
+            taken.update((username, email))
+        for record in records:
+            email = record['email']
+            if email in taken:
+                duplicates += 1
+                continue
+            taken.add(email)  # The same address journaled twice: the first signup wins
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        username=email,
+                        email=email,
+                        password=record['password'],
+                        date_joined=parse_datetime(record['created_at']),
+                    )
+                    UserProfile.objects.create(
+                        user=user,
+                        full_name=record['full_name'],
+                        phone=record['phone'],
+                        shield_limit_percent=record['shield_limit_percent'],
+                    )
+            except IntegrityError:
+                duplicates += 1  # Signed up through the normal path since the existence query
+                continue
+            created += 1
+    return created, duplicates
+
+
+def replay_in_background(journal):
+    """Drain the journal from a daemon thread (called when the signup circuit breaker closes)"""
+    if not journal.has_pending():
+        return
+
+    def run():
+        try:
+            created, duplicates = replay_signups(journal)
+            logger.info(f'Replayed signup journal: {created} created, {duplicates} duplicates')
+        except JournalBusy:
+            pass
+        except Exception as e:
+            logger.error(f'Signup journal replay failed, will retry: {e}')
+        finally:
+            # This thread's connection is never closed by request_finished, so don't hold it open
+            connections.close_all()
+
+    threading.Thread(target=run, name='signup-journal-replay', daemon=True).start()
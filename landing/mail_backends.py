@@ -0,0 +1,231 @@
+"""
+Non-blocking SMTP email backend.
+
+AsyncSMTPBackend hands messages to a per-process asyncio event loop running in a daemon thread.
+The loop keeps a small pool of authenticated aiosmtplib sessions open and sends messages over
+them concurrently, so a slow provider handshake is paid once per session instead of once per
+email, and a batch of N emails takes roughly N / EMAIL_POOL_SIZE round trips instead of N.
+
+send_messages() is the usual synchronous Django API (EmailMultiAlternatives, send_mail and
+mail_admins work unchanged); it blocks only the calling thread, while other threads and
+processes' sends keep flowing. send_each() is the batch form used by landing.emails: one
+(error, seconds) pair per message instead of raising on the first failure.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+
+import aiosmtplib
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import sanitize_address
+
+
+class SMTPPool:
+    """Up to size open SMTP sessions to one server, shared by every send in this process"""
+
+    def __init__(self, size, idle_timeout, **client_kwargs):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.client_kwargs = client_kwargs
+        self._idle = []  # (client, last used), most recently used last
+        self._slots = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        """Returns (client, reused): an idle session if one is still usable, else a new one"""
+        await self._slots.acquire()  # Outside the try: a send cancelled while queued holds no slot
+        try:
+            while self._idle:
+                client, last_used = self._idle.pop()
+                # Providers drop idle sessions after a while (Gmail: a few minutes); don't find out mid-send
+                if client.is_connected and time.monotonic() - last_used < self.idle_timeout:
+                    return client, True
+                await self.close(client)
+            client = aiosmtplib.SMTP(**self.client_kwargs)
+            await client.connect()  # Also does STARTTLS and AUTH when configured
+            return client, False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, client, reusable):
+        if reusable and client.is_connected:
+            self._idle.append((client, time.monotonic()))
+        else:
+            asyncio.ensure_future(self.close(client))
+        self._slots.release()
+
+    async def close(self, client):
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def close_idle(self):
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self.close(client) for client, _ in idle))
+
+    async def send(self, message):
+        """Send one EmailMessage; returns (exception or None, seconds)"""
+        start = time.perf_counter()
+        encoding = message.encoding or settings.DEFAULT_CHARSET
+        sender = sanitize_address(message.from_email, encoding)
+        recipients = [sanitize_address(address, encoding) for address in message.recipients()]
+        data = message.message().as_bytes(linesep='\r\n')
+        while True:
+            try:
+                client, reused = await self.acquire()
+            except Exception as e:
+                return e, time.perf_counter() - start
+            try:
+                await client.sendmail(sender, recipients, data)
+            except aiosmtplib.SMTPServerDisconnected as e:
+                self.release(client, reusable=False)
+                if reused:
+                    continue  # The pooled session had gone stale; retry on a fresh one
+                return e, time.perf_counter() - start
+            except aiosmtplib.SMTPResponseException as e:
+                # The server refused this message but the session is fine once the transaction is reset
+                try:
+                    await client.rset()
+                    self.release(client, reusable=True)
+                except Exception:
+                    self.release(client, reusable=False)
+                return e, time.perf_counter() - start
+            except BaseException as e:
+                self.release(client, reusable=False)
+                if not isinstance(e, Exception):
+                    raise
+                return e, time.perf_counter() - start
+            self.release(client, reusable=True)
+            return None, time.perf_counter() - start
+
+
+class _EventLoopThread:
+    """The process's email event loop and its pools; recreated after a fork (gunicorn workers)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        self.loop = asyncio.new_event_loop()
+        self.pools = {}
+        self._pid = os.getpid()
+        threading.Thread(target=self.loop.run_forever, name='smtp-loop', daemon=True).start()
+
+    def run(self, coroutine_function, key, pool_kwargs, timeout):
+        """Run coroutine_function(pool) on the loop and wait for its result"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = SMTPPool(**pool_kwargs)
+        future = asyncio.run_coroutine_threadsafe(coroutine_function(pool), self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Stop the sends still in flight; otherwise they go out after the caller gave up on them
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout=2):
+        """QUIT the idle sessions instead of leaving the server to time them out (also run at exit)"""
+        if self._pid != os.getpid():
+            return
+
+        async def close_all():
+            await asyncio.gather(*(pool.close_idle() for pool in list(self.pools.values())))
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), self.loop).result(timeout)
+        except Exception:
+            pass
+
+
+_loop_thread = _EventLoopThread()
+
+
+def close_idle_sessions():
+    """Close every pooled SMTP session in this process, e.g. before the server they point at goes away"""
+    _loop_thread.shutdown()
+
+
+class AsyncSMTPBackend(BaseEmailBackend):
+    """Drop-in replacement for django.core.mail.backends.smtp.EmailBackend, configured the same way"""
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, use_ssl=None,
+                 timeout=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = settings.EMAIL_HOST_USER if username is None else username
+        self.password = settings.EMAIL_HOST_PASSWORD if password is None else password
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = settings.EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = settings.EMAIL_TIMEOUT if timeout is None else timeout
+
+    def pool_settings(self):
+        key = (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+        kwargs = {
+            'size': settings.EMAIL_POOL_SIZE,
+            'idle_timeout': settings.EMAIL_POOL_IDLE_SECONDS,
+            'hostname': self.host,
+            'port': self.port,
+            'username': self.username or None,
+            'password': self.password or None,
+            'use_tls': self.use_ssl,  # aiosmtplib's use_tls is implicit TLS (Django's EMAIL_USE_SSL)
+            'start_tls': self.use_tls,
+            'timeout': self.timeout or 60,
+        }
+        return key, kwargs
+
+    def send_each(self, email_messages):
+        """Send concurrently over the pool; returns (exception or None, seconds) per message, in order"""
+        email_messages = list(email_messages)
+        if not email_messages:
+            return []
+        key, kwargs = self.pool_settings()
+
+        # Every message gets the per-send timeout, but they go out pool-size at a time
+        rounds = -(-len(email_messages) // kwargs['size'])
+        deadline = kwargs['timeout'] * (rounds + 1)
+
+        async def send_one(pool, message):
+            # A message that runs out of time fails on its own; the ones already sent still report success
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(pool.send(message), deadline)
+            except TimeoutError:
+                return TimeoutError(f'SMTP send timed out after {deadline}s'), time.perf_counter() - start
+
+        async def send_all(pool):
+            return await asyncio.gather(*(
+                send_one(pool, message) if message.recipients() else _no_recipients()
+                for message in email_messages
+            ))
+
+        # The outer timeout is only a backstop for a wedged loop
+        return _loop_thread.run(send_all, key, kwargs, timeout=deadline + 5)
+
+    def send_messages(self, email_messages):
+        email_messages = list(email_messages)
+        try:
+            results = self.send_each(email_messages)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        errors = [error for error, _ in results if error is not None]
+        if errors and not self.fail_silently:
+            raise errors[0]
+        return sum(1 for message, (error, _) in zip(email_messages, results) if error is None and message.recipients())
+
+
+async def _no_recipients():
+    return None, 0.0
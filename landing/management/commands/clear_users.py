@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from landing.models import UserProfile
+from landing.profiling import ProfiledCommandMixin
 
-class Command(BaseCommand):
+class Command(ProfiledCommandMixin, BaseCommand):
     help = 'Clear all user data (emails, profiles) from the database'
 
     def add_arguments(self, parser):
@@ -32,10 +33,7 @@ class Command(BaseCommand):
         
         self.stdout.write('\nDeleting all users and profiles...')
         
-        # Get count before deletion
         regular_users = User.objects.filter(is_superuser=False)
-        user_count_before = regular_users.count()
-        profile_count_before = UserProfile.objects.count()
         
         # Delete UserProfiles first (they have foreign keys to User)
         deleted_profiles = UserProfile.objects.all().delete()
@@ -43,7 +41,7 @@ class Command(BaseCommand):
         
         # Delete only regular users (preserve superusers)
         deleted_users = regular_users.delete()
-        deleted_count = deleted_users[0] if isinstance(deleted_users, tuple) else user_count_before
+        deleted_count = deleted_users[0] if isinstance(deleted_users, tuple) else user_count
         
         remaining_superusers = User.objects.filter(is_superuser=True).count()
         
@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from landing.models import UserProfile
+from landing.profiling import ProfiledCommandMixin
 
-class Command(BaseCommand):
+class Command(ProfiledCommandMixin, BaseCommand):
     help = 'Delete a specific user by email address'
 
     def add_arguments(self, parser):
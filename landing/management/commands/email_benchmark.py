@@ -0,0 +1,138 @@
+import json
+import math
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+from landing.emails import deliver_pending_emails
+from landing.mail_backends import close_idle_sessions
+from landing.models import PendingEmail
+
+from .smtp_sink import add_fault_arguments, sink_from_options
+
+
+class Command(BaseCommand):
+    help = 'Seed PendingEmail rows, drain them the way send_welcome_emails does against an SMTP sink and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=200, help='Queued emails to seed (default: 200)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Emails per run, like send_welcome_emails --limit (default: 20)')
+        parser.add_argument('--max-runs', type=int, default=None,
+                            help='Stop after this many runs (default: 3x what a clean drain needs)')
+        parser.add_argument('--backend', type=str, default=None,
+                            help='Email backend to benchmark (default: EMAIL_BACKEND, or the SMTP backend if that '
+                                 'is a console/locmem/dummy backend)')
+        parser.add_argument('--sink', type=str, default=None,
+                            help='host:port of an already running `manage.py smtp_sink` (default: start one in-process)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--i-know-this-is-production', action='store_true', dest='allow_production',
+                            help='Run even though DEBUG is off (it writes and deletes rows in this database)')
+        add_fault_arguments(parser)
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError(
+                'email_benchmark writes a throwaway user and its queued emails to this database. '
+                'Run it with DEBUG on, or pass --i-know-this-is-production'
+            )
+
+        sink = None
+        if options['sink']:
+            host, _, port = options['sink'].rpartition(':')
+            port = int(port)
+        else:
+            sink = sink_from_options(options)
+            host, port = sink.host, sink.start_in_thread()
+
+        backend = options['backend'] or settings.EMAIL_BACKEND
+        if backend.rsplit('.', 2)[-2] in ('console', 'locmem', 'dummy', 'filebased'):
+            backend = 'django.core.mail.backends.smtp.EmailBackend'
+
+        runs = options['max_runs'] or 3 * math.ceil(options['emails'] / options['batch_size'])
+        try:
+            with override_settings(
+                EMAIL_BACKEND=backend, EMAIL_HOST=host, EMAIL_PORT=port,
+                EMAIL_USE_TLS=False, EMAIL_USE_SSL=False, EMAIL_TIMEOUT=30,
+            ):
+                report = self.run_benchmark(options['emails'], options['batch_size'], runs)
+        finally:
+            close_idle_sessions()  # The AsyncSMTPBackend keeps its sessions to the sink open
+            if sink:
+                sink.stop_thread()
+        report['backend'] = backend
+        if sink:
+            report['sink'] = sink.stats.as_dict()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def run_benchmark(self, count, batch_size, max_runs):
+        """Seed rows for a throwaway user and drain only those; the real queue is never touched"""
+        user = User.objects.create(username=f'email-benchmark-{uuid.uuid4().hex[:12]}', email='benchmark@example.com')
+        try:
+            PendingEmail.objects.bulk_create([
+                PendingEmail(user=user, email_type='welcome', email_data={
+                    'to': f'benchmark-{i}@example.com',
+                    'subject': 'Welcome to Aigis',
+                    'text_content': 'Your 28-day trial is active.',
+                    'html_content': '<p>Your 28-day trial is active.</p>',
+                })
+                for i in range(count)
+            ], batch_size=500)
+            # created_at is auto_now_add; push the rows into the future so a send_welcome_emails
+            # run (cron or run_jobs) never picks them up while the benchmark is draining them
+            PendingEmail.objects.filter(user=user).update(created_at=timezone.now() + timedelta(days=365))
+            queue = PendingEmail.objects.filter(user=user)
+
+            # Each run mirrors one send_welcome_emails run, in short autocommit statements
+            run_seconds = []
+            started = time.perf_counter()
+            while len(run_seconds) < max_runs and queue.filter(sent=False).exists():
+                run_started = time.perf_counter()
+                deliver_pending_emails(
+                    queue.filter(sent=False).order_by('created_at', 'id')[:batch_size], settings.EMAIL_POOL_SIZE,
+                )
+                run_seconds.append(time.perf_counter() - run_started)
+            elapsed = time.perf_counter() - started
+
+            sent = queue.filter(sent=True).count()
+            return {
+                'emails': count,
+                'batch_size': batch_size,
+                'sent': sent,
+                'unsent': count - sent,
+                'runs': len(run_seconds),
+                'elapsed_s': round(elapsed, 3),
+                'emails_per_s': round(sent / elapsed, 1) if elapsed else None,
+                'run_ms_p50': round(sorted(run_seconds)[len(run_seconds) // 2] * 1000, 1) if run_seconds else None,
+                'run_ms_max': round(max(run_seconds) * 1000, 1) if run_seconds else None,
+                # Failed attempts per row: how much retrying the drain needed
+                'attempts': {
+                    str(row['attempts']): row['n']
+                    for row in queue.values('attempts').annotate(n=Count('id')).order_by('attempts')
+                },
+            }
+        finally:
+            user.delete()  # Cascades to its PendingEmail rows
+
+    def print_report(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Sent {report["sent"]}/{report["emails"]} emails in {report["elapsed_s"]}s '
+            f'({report["emails_per_s"]} emails/s) over {report["runs"]} run(s)'
+        ))
+        self.stdout.write(f'   - backend: {report["backend"]}')
+        self.stdout.write(f'   - per run: p50 {report["run_ms_p50"]} ms, max {report["run_ms_max"]} ms (batch of {report["batch_size"]})')
+        self.stdout.write(f'   - failed attempts per email: {report["attempts"]}')
+        if report['unsent']:
+            self.stdout.write(self.style.WARNING(f'   - {report["unsent"]} still unsent when the run limit was reached'))
+        if 'sink' in report:
+            self.stdout.write(f'   - sink: {", ".join(f"{k}={v}" for k, v in report["sink"].items())}')
+        self.stdout.write('   (the benchmark user and its rows were deleted)')
@@ -0,0 +1,54 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+
+
+class Command(BaseCommand):
+    help = 'Create the admin superuser if none exists (idempotent; used by start.sh on every boot)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--migrate',
+            action='store_true',
+            help='Apply pending migrations first, in the same process (skipped when there are none)',
+        )
+        parser.add_argument('--username', type=str, default=os.environ.get('DJANGO_SUPERUSER_USERNAME', 'admin'))
+        parser.add_argument('--email', type=str, default=os.environ.get('DJANGO_SUPERUSER_EMAIL', 'pvarad2022@gmail.com'))
+
+    def handle(self, *args, **options):
+        if options['migrate']:
+            self.migrate()
+
+        User = get_user_model()
+        username = options['username']
+        # One query answers both "any superuser?" and "is the username taken?"
+        flags = set(
+            User.objects.filter(Q(is_superuser=True) | Q(username=username)).values_list('is_superuser', flat=True)[:2]
+        )
+        if True in flags:
+            self.stdout.write('Superuser already exists')
+            return
+        if flags:
+            self.stdout.write(self.style.WARNING(f'Superuser username already exists: {username}'))
+            return
+
+        password = os.environ.get('DJANGO_SUPERUSER_PASSWORD', 'aigis2025admin')
+        User.objects.create_superuser(username=username, email=options['email'], password=password)
+        self.stdout.write(self.style.SUCCESS(f'✓ Superuser created: {username}'))
+
+    def migrate(self):
+        # `migrate` with nothing to apply still runs post_migrate (permission and content type
+        # checks, dozens of queries against a possibly sleeping Neon); look at the plan first
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write('No migrations to apply.')
+            return
+        self.stdout.write(f'Applying {len(plan)} migration(s)...')
+        call_command('migrate', interactive=False, verbosity=1, stdout=self.stdout)
@@ -0,0 +1,218 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from landing.forms import SignupForm
+from landing.models import UserProfile
+
+MAX_ERRORS_SHOWN = 20
+INSERT_ATTEMPTS = 3
+
+
+def _init_worker():
+    # Needed when the platform spawns (rather than forks) hashing processes
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Import users from a CSV file (full_name,email,password,phone,shield_limit_percent) in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='Path to the CSV file (header row required)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per transaction / bulk insert (default: 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for password hashing (default: CPU count)',
+        )
+        parser.add_argument(
+            '--invite',
+            action='store_true',
+            help='Ignore the password column: set unusable passwords and write password-reset invite tokens',
+        )
+        parser.add_argument(
+            '--invite-output',
+            type=str,
+            default=None,
+            help='Where to write email,uid,token rows in --invite mode (default: <csv_file>.invites.csv)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report what would be imported without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['csv_file']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        self.invite = options['invite']
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        self.seen = set()
+        self.stats = {'rows': 0, 'invalid': 0, 'duplicate': 0, 'existing': 0, 'created': 0}
+        self.invite_writer = None
+        invite_file = None
+
+        if self.invite and not self.dry_run:
+            invite_path = options['invite_output'] or f'{path}.invites.csv'
+            invite_file = open(invite_path, 'w', newline='', encoding='utf-8')
+            self.invite_writer = csv.writer(invite_file)
+            self.invite_writer.writerow(['email', 'uid', 'token'])
+            self.stdout.write(f'Writing invite tokens to {invite_path}')
+
+        started = time.monotonic()
+        executor = None
+        if not self.invite and self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                batch = []
+                for row in self.valid_rows(csv.DictReader(f)):
+                    batch.append(row)
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(batch, executor)
+                        batch = []
+                if batch:
+                    self.import_batch(batch, executor)
+        finally:
+            if executor:
+                executor.shutdown()
+            if invite_file:
+                invite_file.close()
+
+        elapsed = time.monotonic() - started
+        rate = self.stats['created'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {"Validated" if self.dry_run else "Imported"} {self.stats["rows"]} rows in {elapsed:.1f}s\n'
+            f'   - {self.stats["created"]} users {"would be " if self.dry_run else ""}created ({rate:.0f}/s)\n'
+            f'   - {self.stats["existing"]} already had an account\n'
+            f'   - {self.stats["duplicate"]} duplicate emails in the file\n'
+            f'   - {self.stats["invalid"]} invalid rows'
+        ))
+
+    def valid_rows(self, reader):
+        """Yield cleaned rows, validated with the signup form's rules (minus its per-row email query)"""
+        for line_no, row in enumerate(reader, start=2):
+            self.stats['rows'] += 1
+            data = {key: (value or '').strip() for key, value in row.items() if key}
+            data.setdefault('shield_limit_percent', '')
+            data['shield_limit_percent'] = data['shield_limit_percent'] or '10'
+            form = SignupForm(data, check_existing=False)
+            if self.invite:
+                del form.fields['password']
+            if not form.is_valid():
+                self.stats['invalid'] += 1
+                if self.stats['invalid'] <= MAX_ERRORS_SHOWN:
+                    errors = '; '.join(f'{field}: {msgs[0]}' for field, msgs in form.errors.items())
+                    self.stdout.write(self.style.ERROR(f'✗ Line {line_no}: {errors}'))
+                continue
+            email = form.cleaned_data['email']
+            if email in self.seen:
+                self.stats['duplicate'] += 1
+                continue
+            self.seen.add(email)
+            yield form.cleaned_data
+
+    def existing_emails(self, emails):
+        """The emails among these that already have an account (as username or email)"""
+        existing = set()
+        for username, email in User.objects.filter(Q(username__in=emails) | Q(email__in=emails)).values_list('username', 'email'):
+            existing.update((username.lower(), email.lower()))
+        return existing
+
+    def import_batch(self, rows, executor):
+        emails = [row['email'] for row in rows]
+        existing = self.existing_emails(emails)
+        rows = [row for row in rows if row['email'] not in existing]
+        self.stats['existing'] += len(emails) - len(rows)
+        if self.dry_run:
+            self.stats['created'] += len(rows)
+            return
+        if not rows:
+            return
+
+        users = [User(username=row['email'], email=row['email']) for row in rows]
+        if self.invite:
+            for user in users:
+                user.set_unusable_password()
+        else:
+            passwords = [row['password'] for row in rows]
+            if executor:
+                chunksize = max(1, len(passwords) // (self.workers * 4))
+                hashes = list(executor.map(make_password, passwords, chunksize=chunksize))
+            else:
+                hashes = [make_password(password) for password in passwords]
+            for user, hashed in zip(users, hashes):
+                user.password = hashed
+
+        users, rows = self.insert(users, rows)
+
+        if self.invite_writer:
+            for user in users:
+                self.invite_writer.writerow([
+                    user.email,
+                    urlsafe_base64_encode(force_bytes(user.pk)),
+                    default_token_generator.make_token(user),
+                ])
+
+        self.stats['created'] += len(users)
+        self.stdout.write(f'  {self.stats["created"]} users created...')
+
+    def insert(self, users, rows):
+        """
+        Insert the batch's users and profiles in one transaction; returns the (users, rows) created.
+
+        Hashing happens before this, so a signup can take one of the emails in the meantime. The
+        unique username then fails the whole insert: drop the emails that have an account now
+        and try again.
+        """
+        for attempt in range(1, INSERT_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(users, batch_size=self.batch_size)
+                    UserProfile.objects.bulk_create(
+                        [
+                            UserProfile(
+                                user=user,
+                                full_name=row['full_name'],
+                                phone=row['phone'],
+                                shield_limit_percent=row['shield_limit_percent'],
+                            )
+                            for user, row in zip(users, rows)
+                        ],
+                        batch_size=self.batch_size,
+                    )
+                return users, rows
+            except IntegrityError:
+                if attempt == INSERT_ATTEMPTS:
+                    raise
+            taken = self.existing_emails([row['email'] for row in rows])
+            kept = [(user, row) for user, row in zip(users, rows) if row['email'] not in taken]
+            self.stats['existing'] += len(rows) - len(kept)
+            self.stdout.write(self.style.WARNING(f'  {len(rows) - len(kept)} email(s) signed up during the import, skipped'))
+            users, rows = [user for user, _ in kept], [row for _, row in kept]
+            for user in users:
+                # Rolled back: forget any primary key an earlier bulk_create batch assigned
+                user.pk = None
+                user._state.adding = True
+            if not users:
+                return users, rows
@@ -0,0 +1,231 @@
+import http.client
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ENDPOINTS = ('GET /', 'GET /signup/', 'POST /signup/')
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(sorted_values, pct):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = 'Load-test GET /, GET /signup/ and POST /signup/ against a local gunicorn and report latency as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per GET endpoint (default: 200)')
+        parser.add_argument('--post-requests', type=int, default=40, help='Signup POSTs, each hashes a password (default: 40)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads (default: 8)')
+        parser.add_argument('--gunicorn-workers', type=int, default=2, help='gunicorn worker processes (default: 2)')
+        parser.add_argument('--gunicorn-args', type=str, default='', help='Extra arguments passed to gunicorn, e.g. "--threads 4"')
+        parser.add_argument('--database-url', type=str, default=None,
+                            help='Local Postgres URL to test against (default: a throwaway SQLite database)')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='Only run these endpoints (repeatable)')
+        parser.add_argument('--output', type=str, default=None, help='Also write the JSON report to this file')
+        parser.add_argument('--baseline', type=str, default=None, help='Compare against a stored report and fail on regression')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 latency increase over the baseline, as a fraction (default: 0.25)')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='aigis-loadtest-')
+        server = None
+        try:
+            env = self.server_env(workdir, options['database_url'])
+            self.prepare(env)
+            port = self.free_port()
+            server = self.start_gunicorn(env, port, options)
+            report = {
+                'config': {
+                    'database': 'postgresql' if options['database_url'] else 'sqlite',
+                    'concurrency': options['concurrency'],
+                    'gunicorn_workers': options['gunicorn_workers'],
+                    'gunicorn_args': options['gunicorn_args'],
+                },
+                'endpoints': {},
+            }
+            for endpoint in options['endpoint'] or ENDPOINTS:
+                count = options['post_requests'] if endpoint.startswith('POST') else options['requests']
+                self.stderr.write(f'Running {count} x {endpoint} at concurrency {options["concurrency"]}...')
+                report['endpoints'][endpoint] = self.run_endpoint(port, endpoint, count, options['concurrency'])
+        finally:
+            if server:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+
+        if options['baseline']:
+            regressions = self.compare(report, options['baseline'], options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regression against baseline:\n  ' + '\n  '.join(regressions))
+            self.stderr.write(self.style.SUCCESS('✓ No regressions against the baseline'))
+
+    def server_env(self, workdir, database_url):
+        env = dict(os.environ)
+        env.update({
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'mysite.settings'),
+            'DEBUG': 'False',
+            'ALLOWED_HOSTS': '127.0.0.1,localhost',
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+            'PERF_SAMPLE_RATE': '1',  # Every response carries Server-Timing, which gives the query counts
+            'PERF_SERVER_TIMING_ALL': 'True',
+            'PERF_LOG_LEVEL': 'WARNING',
+            'STATIC_ROOT': os.path.join(workdir, 'static'),
+        })
+        if database_url:
+            env['DATABASE_URL'] = database_url
+        else:
+            env.pop('DATABASE_URL', None)
+            env['SQLITE_PATH'] = os.path.join(workdir, 'loadtest.sqlite3')
+        return env
+
+    def prepare(self, env):
+        for command in (['migrate', '--noinput'], ['collectstatic', '--noinput']):
+            result = subprocess.run(
+                [sys.executable, 'manage.py', *command, '-v', '0'],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f'manage.py {command[0]} failed:\n{result.stderr}')
+
+    def free_port(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def start_gunicorn(self, env, port, options):
+        cmd = [
+            sys.executable, '-m', 'gunicorn', 'mysite.wsgi',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(options['gunicorn_workers']),
+            '--log-level', 'warning',
+            *options['gunicorn_args'].split(),
+        ]
+        server = subprocess.Popen(cmd, cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {server.returncode}')
+            try:
+                status, _, _ = self.request(http.client.HTTPConnection('127.0.0.1', port, timeout=5), 'GET', '/')
+                if status == 200:
+                    return server
+            except OSError:
+                pass
+            time.sleep(0.2)
+        server.terminate()
+        raise CommandError('gunicorn did not become ready within 30s')
+
+    def request(self, conn, method, path, body=None, headers=None):
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        content = response.read()
+        return response.status, response, content
+
+    def run_endpoint(self, port, endpoint, count, concurrency):
+        method, path = endpoint.split(' ', 1)
+        post_headers = self.csrf_headers(port) if method == 'POST' else None
+        run_id = uuid.uuid4().hex[:8]
+
+        def one(i):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            body = None
+            headers = {}
+            if method == 'POST':
+                token, cookie = post_headers
+                body = urllib.parse.urlencode({
+                    'csrfmiddlewaretoken': token,
+                    'full_name': f'Load Test {i}',
+                    'email': f'loadtest-{run_id}-{i}@example.com',
+                    'password': 'LoadTest123',
+                    'phone': '',
+                    'shield_limit_percent': '10',
+                })
+                headers = {'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie}
+            start = time.perf_counter()
+            try:
+                status, response, _ = self.request(conn, method, path, body, headers)
+            except OSError:
+                return time.perf_counter() - start, None, None
+            finally:
+                conn.close()
+            elapsed = time.perf_counter() - start
+            match = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing', ''))
+            return elapsed, status, int(match.group(1)) if match else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(count)))
+        wall = time.perf_counter() - started
+
+        ok_status = 302 if method == 'POST' else 200
+        latencies = sorted(r[0] * 1000 for r in results if r[1] == ok_status)
+        queries = [r[2] for r in results if r[2] is not None]
+        if not latencies:
+            raise CommandError(f'Every request to {endpoint} failed (statuses: {sorted({r[1] for r in results}, key=str)})')
+        return {
+            'requests': count,
+            'errors': count - len(latencies),
+            'rps': round(count / wall, 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'db_queries_median': statistics.median(queries) if queries else None,
+            'db_queries_max': max(queries) if queries else None,
+        }
+
+    def csrf_headers(self, port):
+        """One CSRF cookie + form token pair, reused for every POST (as a browser tab would)"""
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        status, response, content = self.request(conn, 'GET', '/signup/')
+        conn.close()
+        match = CSRF_INPUT.search(content.decode('utf-8', errors='replace'))
+        cookie = next((c.split(';', 1)[0] for c in response.headers.get_all('Set-Cookie') or [] if c.startswith('csrftoken=')), None)
+        if status != 200 or not match or not cookie:
+            raise CommandError('Could not obtain a CSRF token from GET /signup/')
+        return match.group(1), cookie
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for endpoint, current in report['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(endpoint)
+            if not previous:
+                continue
+            limit = previous['p95_ms'] * (1 + tolerance)
+            if current['p95_ms'] > limit:
+                regressions.append(f'{endpoint}: p95 {current["p95_ms"]}ms > {limit:.2f}ms (baseline {previous["p95_ms"]}ms)')
+            if current['db_queries_max'] is not None and previous.get('db_queries_max') is not None \
+                    and current['db_queries_max'] > previous['db_queries_max']:
+                regressions.append(f'{endpoint}: {current["db_queries_max"]} queries > baseline {previous["db_queries_max"]}')
+            if current['errors'] > previous.get('errors', 0):
+                regressions.append(f'{endpoint}: {current["errors"]} errors > baseline {previous.get("errors", 0)}')
+        return regressions
@@ -0,0 +1,187 @@
+import json
+import re
+import statistics
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Lighthouse "Slow 4G" mobile throttling profile
+SLOW_4G = {
+    'offline': False,
+    'latency': 150,
+    'downloadThroughput': 1.6 * 1024 * 1024 / 8,
+    'uploadThroughput': 750 * 1024 / 8,
+}
+
+# LCP entries arrive asynchronously (even buffered ones) and keep coming while late content paints,
+# so resolve only once the page has loaded and no new candidate has shown up for a short idle
+# period, or as soon as the page is hidden (the browser stops reporting LCP at that point)
+PAINT_METRICS_JS = """
+() => new Promise(resolve => {
+  let lcp = null;
+  let idleTimer = null;
+  const done = () => {
+    const paints = {};
+    performance.getEntriesByType('paint').forEach(e => { paints[e.name] = e.startTime; });
+    const nav = performance.getEntriesByType('navigation')[0];
+    resolve({
+      ttfb: nav.responseStart,
+      first_paint: paints['first-paint'] || null,
+      first_contentful_paint: paints['first-contentful-paint'] || null,
+      largest_contentful_paint: lcp,
+      dom_content_loaded: nav.domContentLoadedEventEnd,
+      load: nav.loadEventEnd,
+    });
+  };
+  const settle = () => { clearTimeout(idleTimer); idleTimer = setTimeout(done, 1000); };
+  new PerformanceObserver(list => {
+    const entries = list.getEntries();
+    lcp = entries[entries.length - 1].startTime;
+    if (document.readyState === 'complete') settle();
+  }).observe({type: 'largest-contentful-paint', buffered: true});
+  document.addEventListener('visibilitychange', () => { if (document.hidden) done(); }, {once: true});
+  if (document.readyState === 'complete') settle();
+  else window.addEventListener('load', settle, {once: true});
+  setTimeout(done, 15000);  // Never hang the run on a page that keeps painting
+})
+"""
+
+
+class Command(BaseCommand):
+    help = 'Lighthouse-style first-paint benchmark for a running server (headless Chromium via Playwright if installed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', default='http://127.0.0.1:8000/', help='Page to measure (default: http://127.0.0.1:8000/)')
+        parser.add_argument('--runs', type=int, default=5, help='Number of cold-cache runs (default: 5)')
+        parser.add_argument('--no-throttle', action='store_true', help='Disable Slow 4G network emulation in the browser runs')
+        parser.add_argument('--http-only', action='store_true', help='Skip the browser and only report HTML/critical-path metrics')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--baseline', type=str, default=None,
+                            help='Second URL to measure the same way, or a report saved with --json, '
+                                 'and print the before/after difference')
+
+    def handle(self, *args, **options):
+        report = self.measure(options['url'], options)
+
+        baseline = None
+        if options['baseline']:
+            if re.match(r'https?://', options['baseline']):
+                baseline = self.measure(options['baseline'], options)
+            else:
+                try:
+                    with open(options['baseline']) as f:
+                        baseline = json.load(f)
+                except (OSError, ValueError) as e:
+                    raise CommandError(f'Could not read baseline {options["baseline"]}: {e}')
+            report['baseline'] = baseline['url']
+            report['diff'] = self.diff(baseline, report)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if baseline is None:
+            self.stdout.write(f'Paint benchmark for {report["url"]} ({report["runs"]} runs, medians)')
+            for section in ('critical_path', 'browser'):
+                for name, value in report.get(section, {}).items():
+                    unit = 'ms' if isinstance(value, float) else ''
+                    self.stdout.write(f'  {name:<28} {value:>10.1f} {unit}' if unit else f'  {name:<28} {value:>10}')
+            return
+
+        self.stdout.write(f'Paint benchmark for {report["url"]} against {baseline["url"]} ({report["runs"]} runs, medians)')
+        self.stdout.write(f'  {"":<28} {"before":>10} {"after":>10} {"change":>10}')
+        for name, row in report['diff'].items():
+            pct = f' ({row["change_pct"]:+.1f}%)' if row['change_pct'] is not None else ''
+            self.stdout.write(f'  {name:<28} {row["before"]:>10.1f} {row["after"]:>10.1f} {row["change"]:>+10.1f}{pct}')
+
+    def measure(self, url, options):
+        report = {'url': url, 'runs': options['runs']}
+        report['critical_path'] = self.measure_critical_path(url, options['runs'])
+
+        if not options['http_only']:
+            try:
+                from playwright.sync_api import sync_playwright
+            except ImportError:
+                self.stderr.write('Playwright not installed - reporting HTML metrics only '
+                                  '(pip install playwright && playwright install chromium)')
+            else:
+                report['browser'] = self.measure_in_browser(sync_playwright, url, options)
+        return report
+
+    def diff(self, before, after):
+        """Metric-by-metric change for every metric both reports have"""
+        rows = {}
+        for section in ('critical_path', 'browser'):
+            for name, value in after.get(section, {}).items():
+                old = before.get(section, {}).get(name)
+                if old is None:
+                    continue
+                rows[name] = {
+                    'before': float(old),
+                    'after': float(value),
+                    'change': float(value - old),
+                    'change_pct': round((value - old) / old * 100, 1) if old else None,
+                }
+        return rows
+
+    def measure_critical_path(self, url, runs):
+        """Server-side view of the critical path: TTFB, <head> weight and render-blocking resources"""
+        ttfbs = []
+        body = b''
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    first_byte = response.read(1)
+                    ttfbs.append((time.perf_counter() - start) * 1000)
+                    body = first_byte + response.read()
+            except OSError as e:
+                raise CommandError(f'Could not fetch {url}: {e}')
+
+        html = body.decode('utf-8', errors='replace')
+        head = html.split('</head>', 1)[0]
+        blocking_css = [
+            tag for tag in re.findall(r'<link\b[^>]*>', head)
+            if 'rel="stylesheet"' in tag and 'media="print"' not in tag
+        ]
+        # <noscript> fallbacks are inert for script-enabled browsers
+        blocking_css = [tag for tag in blocking_css if tag not in ''.join(re.findall(r'<noscript>.*?</noscript>', head, re.S))]
+        blocking_js = [
+            tag for tag in re.findall(r'<script\b[^>]*\bsrc=[^>]*>', head)
+            if 'async' not in tag and 'defer' not in tag and 'type="module"' not in tag
+        ]
+        return {
+            'ttfb_ms': statistics.median(ttfbs),
+            'html_bytes': len(body),
+            'head_bytes': len(head.encode('utf-8')),
+            'render_blocking_stylesheets': len(blocking_css),
+            'render_blocking_scripts': len(blocking_js),
+            'third_party_origins': len(set(re.findall(r'(?:href|src)="(https?://[^/"]+)', head))),
+        }
+
+    def measure_in_browser(self, sync_playwright, url, options):
+        samples = []
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            try:
+                for _ in range(options['runs']):
+                    # A fresh context per run means a cold HTTP cache, like a first visit
+                    context = browser.new_context(viewport={'width': 412, 'height': 823}, is_mobile=True)
+                    page = context.new_page()
+                    if not options['no_throttle']:
+                        cdp = context.new_cdp_session(page)
+                        cdp.send('Network.enable')
+                        cdp.send('Network.emulateNetworkConditions', SLOW_4G)
+                    page.goto(url, wait_until='load')
+                    samples.append(page.evaluate(PAINT_METRICS_JS))
+                    context.close()
+            finally:
+                browser.close()
+
+        result = {}
+        for key in samples[0]:
+            values = [s[key] for s in samples if s[key] is not None]
+            if values:
+                result[f'{key}_ms'] = float(statistics.median(values))
+        return result
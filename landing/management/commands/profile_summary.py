@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from landing.profiling import hot_functions, profiles, read_stacks
+
+
+class Command(BaseCommand):
+    help = 'Hottest functions in a sampling profile from PROFILE_DIR (default: the newest one)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', nargs='?', help='Profile file, or its name in PROFILE_DIR')
+        parser.add_argument('--limit', type=int, default=25, help='Functions to show (default: 25)')
+        parser.add_argument('--list', action='store_true', help='List the saved profiles instead')
+
+    def handle(self, *args, **options):
+        saved = profiles()
+        if options['list']:
+            for path in saved:
+                self.stdout.write(f'{path.name}  ({sum(read_stacks(path).values())} samples)')
+            if not saved:
+                self.stdout.write('No profiles saved yet.')
+            return
+
+        path = self.find(options['profile'], saved)
+        stacks = read_stacks(path)
+        total = sum(stacks.values())
+        if not total:
+            self.stdout.write(f'{path.name}: no samples (the profiled code finished within one sampling interval).')
+            return
+
+        self_counts, total_counts = hot_functions(stacks)
+        self.stdout.write(f'{path.name}: {total} samples\n')
+        self.stdout.write(f'{"self":>6} {"total":>6}  function')
+        for name, count in self_counts.most_common(options['limit']):
+            self.stdout.write(f'{count / total:>6.1%} {total_counts[name] / total:>6.1%}  {name}')
+
+        # Where the time goes below the request/command entry points: biggest inclusive costs from this repo's code
+        own = [
+            (name, count) for name, count in total_counts.most_common()
+            if '(landing/' in name and '(landing/profiling.py' not in name and '(landing/middleware.py' not in name
+        ]
+        if own:
+            self.stdout.write('\nlanding/ code by total time:')
+            for name, count in own[:10]:
+                self.stdout.write(f'{count / total:>6.1%}  {name}')
+
+    def find(self, name, saved):
+        if name is None:
+            if not saved:
+                raise CommandError('No profiles saved yet (see manage.py profile_token, or run a command with --profile).')
+            return saved[0]
+        path = Path(name)
+        if path.exists():
+            return path
+        for candidate in saved:
+            if candidate.name == name:
+                return candidate
+        raise CommandError(f'Profile not found: {name}')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.profiling import PROFILE_HEADER, make_token
+
+
+class Command(BaseCommand):
+    help = 'Print a signed token that makes ProfilerMiddleware profile requests carrying it'
+
+    def handle(self, *args, **options):
+        token = make_token()
+        self.stdout.write(token)
+        self.stderr.write(
+            f'Valid for {settings.PROFILE_TOKEN_SECONDS}s. Example:\n'
+            f'  curl -sI -H "{PROFILE_HEADER}: {token}" https://your-app.onrender.com/signup/ | grep -i profile-file\n'
+            f'then, in the same instance: python manage.py profile_summary'
+        )
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from landing.models import UserProfile, WaitlistEntry
+
+
+class Command(BaseCommand):
+    help = 'Create User/UserProfile accounts (unusable passwords) for waitlist entries in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum number of waitlist entries to promote (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Entries per transaction / bulk insert (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many entries would be promoted',
+        )
+
+    def handle(self, *args, **options):
+        pending = WaitlistEntry.objects.filter(promoted_at__isnull=True).order_by('id')
+        total = pending.count()
+        if options['limit'] is not None:
+            total = min(total, options['limit'])
+        self.stdout.write(f'Found {total} waitlist entr{"y" if total == 1 else "ies"} to promote.')
+        if options['dry_run'] or total == 0:
+            return
+
+        batch_size = options['batch_size']
+        last_id = 0
+        processed = created = skipped = left = 0
+        while processed < total:
+            batch = list(pending.filter(id__gt=last_id)[:min(batch_size, total - processed)])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            processed += len(batch)
+            batch_created, batch_promoted = self.promote_batch(batch)
+            created += batch_created
+            skipped += batch_promoted - batch_created
+            left += len(batch) - batch_promoted
+            self.stdout.write(f'  {processed}/{total} processed ({created} accounts created)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Promoted {processed - left} waitlist entries\n'
+            f'   - {created} accounts created\n'
+            f'   - {skipped} already had an account'
+        ))
+        if left:
+            self.stdout.write(self.style.WARNING(f'   - {left} could not get an account and are left for the next run'))
+
+    def promote_batch(self, batch):
+        """Create accounts for one batch in a single transaction; returns (accounts created, entries promoted)"""
+        emails = sorted({entry.email.lower() for entry in batch})
+        with transaction.atomic():
+            existing = set(User.objects.filter(username__in=emails).values_list('username', flat=True))
+            existing.update(e.lower() for e in User.objects.filter(email__in=emails).values_list('email', flat=True))
+            new_emails = [email for email in emails if email not in existing]
+
+            users = []
+            for email in new_emails:
+                user = User(username=email, email=email)
+                user.set_unusable_password()  # No hashing cost; they set a password via reset later
+                users.append(user)
+            # ignore_conflicts covers a signup racing us for the same username; ids are re-read below
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            # bulk_create doesn't report which rows ignore_conflicts dropped, so count what now exists
+            user_ids = dict(User.objects.filter(username__in=new_emails).values_list('username', 'id'))
+            UserProfile.objects.bulk_create(
+                [
+                    UserProfile(
+                        user_id=user_ids[email],
+                        full_name=email.split('@')[0],  # Same default as the admin's create_missing_profiles
+                        phone='',
+                        shield_limit_percent=10,
+                    )
+                    for email in new_emails if email in user_ids
+                ],
+                ignore_conflicts=True,
+            )
+            # Only entries that ended up with an account; the rest stay pending for the next run
+            promoted = [entry.id for entry in batch if entry.email.lower() in existing or entry.email.lower() in user_ids]
+            WaitlistEntry.objects.filter(id__in=promoted).update(promoted_at=timezone.now())
+        return len(user_ids), len(promoted)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from landing.journal import JournalBusy, SignupJournal, replay_signups
+
+
+class Command(BaseCommand):
+    help = 'Create the accounts for signups journaled while the database was unavailable (idempotent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default=None, help='Journal file (default: SIGNUP_JOURNAL_PATH)')
+
+    def handle(self, *args, **options):
+        journal = SignupJournal(options['path'])
+        if not journal.has_pending():
+            self.stdout.write('Signup journal is empty.')
+            return
+
+        try:
+            connections[DEFAULT_DB_ALIAS].ensure_connection()
+        except Exception as e:
+            raise CommandError(f'Database still unavailable, journal kept at {journal.path}: {e}')
+
+        created = duplicates = 0
+        try:
+            # A second pass picks up the live journal when the first drained one left by an earlier crash
+            while journal.has_pending():
+                batch_created, batch_duplicates = replay_signups(journal)
+                created += batch_created
+                duplicates += batch_duplicates
+        except JournalBusy:
+            self.stdout.write(self.style.WARNING('Another process is already replaying the signup journal.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Replayed signup journal: {created} account(s) created, {duplicates} duplicate(s) skipped'
+        ))
@@ -0,0 +1,80 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from landing.jobs import KINDS, claim_job, run_job, wake_file
+from landing.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run queued admin jobs (bulk deletes, profile creation, CSV exports) in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs queued now, then exit')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per chunk (default: JOB_CHUNK_SIZE)')
+        parser.add_argument(
+            '--poll-seconds',
+            type=float,
+            default=600,
+            help='Check the database for jobs this often when not woken by an enqueue on this machine '
+                 '(default: 600, so an idle worker lets Neon suspend)',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            # Render sends SIGTERM on deploys: finish the chunk in flight and re-queue the job
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            self.stdout.write('Waiting for jobs...')
+
+        last_wake = self.wake_mtime()
+        while not self.stopping:
+            job = claim_job()
+            if job is not None:
+                self.run(job, options['chunk_size'])
+                continue
+            if options['once']:
+                break
+            # Idle: close the connection and watch the wake file instead of the database
+            connections.close_all()
+            last_poll = time.monotonic()
+            while not self.stopping and time.monotonic() - last_poll < options['poll_seconds']:
+                time.sleep(1)
+                mtime = self.wake_mtime()
+                if mtime != last_wake:
+                    last_wake = mtime
+                    break
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def wake_mtime(self):
+        try:
+            return wake_file().stat().st_mtime
+        except OSError:
+            return None
+
+    def run(self, job, chunk_size):
+        label = KINDS[job.kind].label if job.kind in KINDS else job.kind
+        resumed = f' (resuming after pk {job.cursor})' if job.cursor else ''
+        self.stdout.write(f'Job #{job.pk}: {label}{resumed}')
+
+        def progress(job):
+            if job.total:
+                self.stdout.write(f'  {job.processed}/{job.total} rows ({job.rows_per_second or 0:.0f} rows/s)')
+
+        job = run_job(job, chunk_size, should_stop=lambda: self.stopping, on_chunk=progress)
+        if job.status == Job.DONE:
+            rate = f' ({job.rows_per_second:.0f} rows/s)' if job.rows_per_second else ''
+            result = f', wrote {settings.JOB_RESULTS_DIR}/{job.result_file}' if job.result_file else ''
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Job #{job.pk} done: {job.processed} rows in {job.run_seconds:.1f}s{rate}{result}'
+            ))
+        elif job.status == Job.QUEUED:
+            self.stdout.write(self.style.WARNING(f'Job #{job.pk} paused after {job.processed} rows; it will resume'))
+        else:
+            self.stdout.write(self.style.ERROR(f'✗ Job #{job.pk} failed after {job.processed} rows: {job.error}'))
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from landing.db.slow_queries import read_log, seq_scans
+
+
+class Command(BaseCommand):
+    help = 'Summarise the slow-query log per query fingerprint, worst first, with sequential scans from EXPLAIN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default=None, help='Log file (default: SLOW_QUERY_LOG_PATH)')
+        parser.add_argument('--sort', choices=['total', 'max', 'count'], default='total', help='Order by (default: total time)')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints to show (default: 20)')
+        parser.add_argument('--hours', type=float, default=None, help='Only entries from the last N hours')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after printing it')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.SLOW_QUERY_LOG_PATH
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+
+        stats = {}
+        for entry in read_log(path):
+            if since and datetime.fromisoformat(entry['at']) < since:
+                continue
+            stat = stats.setdefault(entry['fingerprint'], {
+                'sql': entry['sql'], 'count': 0, 'total': 0.0, 'max': 0.0, 'sources': {}, 'explain': None,
+            })
+            stat['count'] += 1
+            stat['total'] += entry['ms']
+            stat['max'] = max(stat['max'], entry['ms'])
+            stat['sources'][entry['source']] = stat['sources'].get(entry['source'], 0) + 1
+            if stat['explain'] is None and entry.get('explain'):
+                stat['explain'] = entry['explain']
+
+        if not stats:
+            self.stdout.write(f'No slow queries logged in {path}.')
+            return
+
+        ranked = sorted(stats.items(), key=lambda item: item[1][options['sort']], reverse=True)
+        self.stdout.write(f'{len(stats)} slow query fingerprint(s) (over {settings.SLOW_QUERY_MS:g} ms) in {path}:\n')
+        for key, stat in ranked[:options['limit']]:
+            self.stdout.write(self.style.WARNING(
+                f'{key}  {stat["count"]}x  total {stat["total"]:.0f} ms  '
+                f'mean {stat["total"] / stat["count"]:.0f} ms  max {stat["max"]:.0f} ms'
+            ))
+            self.stdout.write(f'  {stat["sql"][:500]}')
+            sources = sorted(stat['sources'].items(), key=lambda item: item[1], reverse=True)
+            self.stdout.write('  from ' + ', '.join(f'{source} ({count})' for source, count in sources[:5]))
+            if isinstance(stat['explain'], dict) and 'error' in stat['explain']:
+                self.stdout.write(f'  EXPLAIN failed: {stat["explain"]["error"]}')
+            for table, condition, rows in seq_scans(stat['explain']):
+                # A filtered scan of a whole table is what an index on the filtered columns would fix
+                hint = f' filter {condition}' if condition else ''
+                self.stdout.write(self.style.ERROR(f'  ✗ Seq Scan on {table} (~{rows} rows){hint}'))
+            self.stdout.write('')
+
+        if options['clear']:
+            open(path, 'w').close()
+            self.stdout.write(self.style.SUCCESS(f'✓ Cleared {path}'))
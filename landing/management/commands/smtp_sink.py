@@ -0,0 +1,63 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from landing.smtp_sink import SMTPSink
+
+
+def add_fault_arguments(parser):
+    """Fault-injection options shared with email_benchmark"""
+    parser.add_argument('--connect-latency', type=float, default=0, help='Delay before the greeting, in ms (default: 0)')
+    parser.add_argument('--latency', type=float, default=0, help='Delay before answering DATA, in ms (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0, help='Random extra delay up to this many ms (default: 0)')
+    parser.add_argument('--rate', type=float, default=None, help='Accept at most this many messages per second; excess get 451')
+    parser.add_argument('--temp-fail-rate', type=float, default=0, help='Probability of a 451 reply to DATA (default: 0)')
+    parser.add_argument('--perm-fail-rate', type=float, default=0, help='Probability of a 554 reply to DATA (default: 0)')
+    parser.add_argument('--drop-rate', type=float, default=0, help='Probability of cutting the connection mid-DATA (default: 0)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed, for repeatable fault patterns')
+
+
+def sink_from_options(options, host='127.0.0.1', port=0):
+    return SMTPSink(
+        host=host,
+        port=port,
+        connect_latency=options['connect_latency'] / 1000,
+        latency=options['latency'] / 1000,
+        jitter=options['jitter'] / 1000,
+        rate=options['rate'],
+        temp_fail_rate=options['temp_fail_rate'],
+        perm_fail_rate=options['perm_fail_rate'],
+        drop_rate=options['drop_rate'],
+        seed=options['seed'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP sink that discards mail and injects latency, throttling and failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=1025, help='Port to listen on (default: 1025)')
+        parser.add_argument('--stats-every', type=float, default=5, help='Print counters every N seconds (default: 5)')
+        add_fault_arguments(parser)
+
+    def handle(self, *args, **options):
+        sink = sink_from_options(options, options['host'], options['port'])
+        try:
+            asyncio.run(self.serve(sink, options['stats_every']))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Sink stopped: {sink.stats}'))
+
+    async def serve(self, sink, stats_every):
+        port = await sink.start()
+        self.stdout.write(f'SMTP sink listening on {sink.host}:{port}')
+        self.stdout.write(f'Point Django at it with EMAIL_HOST={sink.host} EMAIL_PORT={port} EMAIL_USE_TLS=False')
+        server = asyncio.create_task(sink.serve_forever())
+        last = None
+        while not server.done():
+            await asyncio.sleep(stats_every)
+            current = sink.stats.as_dict()
+            if current != last:
+                self.stdout.write(f'  {sink.stats}')
+                last = current
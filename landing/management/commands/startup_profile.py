@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)')
+
+# Run in a fresh interpreter: times settings, then each app's import/models/ready() during django.setup()
+CHILD_SCRIPT = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+t_settings = time.perf_counter()
+
+from django.apps.config import AppConfig
+apps_timing = {}
+original_create = AppConfig.create.__func__
+
+def timed(label, phase, func):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            apps_timing.setdefault(label, {})[phase] = (time.perf_counter() - start) * 1000
+    return wrapper
+
+def create(cls, entry):
+    start = time.perf_counter()
+    config = original_create(cls, entry)
+    apps_timing.setdefault(config.label, {})['import'] = (time.perf_counter() - start) * 1000
+    config.import_models = timed(config.label, 'models', config.import_models)
+    config.ready = timed(config.label, 'ready', config.ready)
+    return config
+
+AppConfig.create = classmethod(create)
+django.setup()
+t_setup = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+t_wsgi = time.perf_counter()
+print(json.dumps({
+    'settings_ms': (t_settings - t0) * 1000,
+    'setup_ms': (t_setup - t_settings) * 1000,
+    'wsgi_ms': (t_wsgi - t_setup) * 1000,
+    'apps': apps_timing,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Profile process startup: -X importtime by package, per-app setup time and cold start to first 200'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Rows to show per table (default: 15)')
+        parser.add_argument('--skip-server', action='store_true', help='Skip the gunicorn cold-start measurement')
+        parser.add_argument('--path', type=str, default='/', help='Path polled for the first 200 (default: /)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'mysite.settings'))
+        report = {
+            'imports': self.profile_imports(env, options['top']),
+            'setup': self.profile_setup(env),
+        }
+        if not options['skip_server']:
+            report['cold_start'] = self.profile_cold_start(env, options['path'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report, options['top'])
+
+    def run_child(self, args, env):
+        result = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Child interpreter failed:\n{result.stderr[-2000:]}')
+        return result
+
+    def profile_imports(self, env, top):
+        """Import cost of loading the WSGI app, from -X importtime, grouped by top-level package"""
+        started = time.perf_counter()
+        result = self.run_child(['-X', 'importtime', '-c', 'from mysite.wsgi import application'], env)
+        wall_ms = (time.perf_counter() - started) * 1000
+        by_package = defaultdict(float)
+        modules = []
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            self_ms, module = int(match.group(1)) / 1000, match.group(2)
+            by_package[module.split('.')[0]] += self_ms
+            modules.append((module, self_ms))
+        return {
+            'interpreter_wall_ms': round(wall_ms, 1),
+            'total_import_ms': round(sum(by_package.values()), 1),
+            'by_package': [[name, round(ms, 1)] for name, ms in sorted(by_package.items(), key=lambda i: -i[1])[:top]],
+            # mysite.wsgi's own time is mostly django.setup(), which profile_setup breaks down
+            'slowest_modules': [[name, round(ms, 1)] for name, ms in sorted(modules, key=lambda i: -i[1])[:top]],
+        }
+
+    def profile_setup(self, env):
+        result = self.run_child(['-c', CHILD_SCRIPT], env)
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        apps = [
+            [label, *(round(phases.get(phase, 0), 1) for phase in ('import', 'models', 'ready'))]
+            for label, phases in data['apps'].items()
+        ]
+        return {
+            'settings_ms': round(data['settings_ms'], 1),
+            'django_setup_ms': round(data['setup_ms'], 1),
+            'wsgi_handler_ms': round(data['wsgi_ms'], 1),
+            'apps': sorted(apps, key=lambda row: -sum(row[1:])),
+        }
+
+    def profile_cold_start(self, env, path):
+        """Launch gunicorn (with gunicorn.conf.py) and time it until path first answers 200"""
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        server_env = dict(env, PORT=str(port), WEB_CONCURRENCY='1')
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'mysite.wsgi', '--bind', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        status = elapsed = None
+        try:
+            while time.perf_counter() - started < 60:
+                if server.poll() is not None:
+                    raise CommandError(f'gunicorn exited with code {server.returncode}')
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=10) as response:
+                        status = response.status
+                except urllib.error.HTTPError as e:
+                    status = e.code
+                except OSError:
+                    time.sleep(0.02)
+                    continue
+                if status == 200:
+                    elapsed = time.perf_counter() - started
+                    break
+                time.sleep(0.02)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+        if status != 200:
+            raise CommandError(f'{path} never returned 200 (last status: {status})')
+        return {'path': path, 'first_200_ms': round(elapsed * 1000, 1)}
+
+    def print_report(self, report, top):
+        imports = report['imports']
+        self.stdout.write(self.style.SUCCESS(
+            f'\nImports: {imports["total_import_ms"]} ms of {imports["interpreter_wall_ms"]} ms to load mysite.wsgi'
+        ))
+        self.stdout.write('  Self time by package:')
+        for name, ms in imports['by_package']:
+            self.stdout.write(f'    {ms:8.1f} ms  {name}')
+        self.stdout.write('  Slowest modules (self time):')
+        for name, ms in imports['slowest_modules']:
+            self.stdout.write(f'    {ms:8.1f} ms  {name}')
+
+        setup = report['setup']
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSetup: settings {setup["settings_ms"]} ms, django.setup() {setup["django_setup_ms"]} ms, '
+            f'WSGI handler {setup["wsgi_handler_ms"]} ms'
+        ))
+        self.stdout.write(f'  {"app":<16}{"import":>10}{"models":>10}{"ready":>10}')
+        for label, imported, models, ready in setup['apps'][:top]:
+            self.stdout.write(f'  {label:<16}{imported:>8.1f}ms{models:>8.1f}ms{ready:>8.1f}ms')
+
+        if 'cold_start' in report:
+            cold = report['cold_start']
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Cold start to first 200 on {cold["path"]}: {cold["first_200_ms"]} ms'))
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from landing.middleware import perf_logger
+from landing.template_loaders import minify
+
+PAGES = ['home', 'signup', 'signup_success', 'privacy', 'terms']
+
+# Rendered fragments must not come from (or go into) the real cache while comparing
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = 'Bytes the minifying template loader saves, per template source and per rendered page'
+
+    def handle(self, *args, **options):
+        template_dir = Path(apps.get_app_config('landing').path) / 'templates'
+        self.stdout.write('Templates (source bytes):')
+        for path in sorted(template_dir.rglob('*.html')):
+            _, stats = minify(path.read_text(encoding='utf-8'))
+            self.stdout.write(
+                f'  {str(path.relative_to(template_dir)):<28} {stats.original:>7} -> {stats.minified:>7}  '
+                f'(-{stats.saved}, {self.percent(stats.saved, stats.original)})  '
+                f'comments -{stats.comments}, whitespace -{stats.whitespace}'
+            )
+
+        original = self.render_pages(minified=False)
+        minified = self.render_pages(minified=True)
+        self.stdout.write('\nPages (rendered bytes, before gzip):')
+        for name in PAGES:
+            before, after = original[name], minified[name]
+            self.stdout.write(
+                f'  {reverse(name):<28} {before:>7} -> {after:>7}  (-{before - after}, {self.percent(before - after, before)})'
+            )
+        total_before, total_after = sum(original.values()), sum(minified.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {total_before - total_after} bytes saved over {len(PAGES)} pages ({self.percent(total_before - total_after, total_before)})'
+        ))
+
+    def render_pages(self, minified):
+        sizes = {}
+        # The requests go through the middleware; keep its per-request timing lines out of the report
+        perf_logger.disabled = True
+        try:
+            with override_settings(TEMPLATE_MINIFY=minified, CACHES=NO_CACHE, ALLOWED_HOSTS=['*']):
+                self.reset_templates()
+                client = Client()
+                for name in PAGES:
+                    response = client.get(reverse(name))
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    sizes[name] = len(body)
+        finally:
+            perf_logger.disabled = False
+        self.reset_templates()  # Back to templates loaded with the real setting
+        return sizes
+
+    def reset_templates(self):
+        for engine in engines.all():
+            for loader in engine.engine.template_loaders:
+                loader.reset()
+
+    def percent(self, part, whole):
+        return f'{part / whole * 100:.1f}%' if whole else '0%'
@@ -0,0 +1,116 @@
+import re
+import string
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Families and weights used by base.css (headings: Montserrat, body: Roboto)
+FONTS = [
+    ('Montserrat', (600, 700)),
+    ('Roboto', (400, 500)),
+]
+
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2'
+# Google only serves WOFF2 to browsers it recognises, so pretend to be one
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+APP_DIR = Path(__file__).resolve().parent.parent.parent
+FONTS_DIR = APP_DIR / 'static' / 'landing' / 'fonts'
+FONTS_CSS = APP_DIR / 'static' / 'landing' / 'css' / 'fonts.css'
+
+
+def font_filename(family, weight):
+    return f'{family.lower()}-{weight}.woff2'
+
+
+class Command(BaseCommand):
+    help = 'Download subsetted WOFF2 web fonts into landing/static so they are served by WhiteNoise (build step)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-download fonts even if they are already vendored',
+        )
+        parser.add_argument(
+            '--allow-fallback',
+            action='store_true',
+            help="Warn instead of failing when Google Fonts can't be reached; pages then link the Google stylesheet",
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=20,
+            help='HTTP timeout in seconds (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        wanted = [(family, weight) for family, weights in FONTS for weight in weights]
+        if not options['force'] and FONTS_CSS.exists() and all((FONTS_DIR / font_filename(f, w)).exists() for f, w in wanted):
+            self.stdout.write('Fonts already vendored (use --force to refresh).')
+            return
+
+        glyphs = self.collect_glyphs()
+        self.stdout.write(f'Subsetting to {len(glyphs)} glyphs used by the landing templates')
+
+        # Everything is downloaded before anything is written, so a failure leaves no half-vendored set
+        try:
+            downloads = [
+                (family, weight, self.fetch(self.find_woff2_url(family, weight, glyphs, options['timeout']), options['timeout']))
+                for family, weight in wanted
+            ]
+        except CommandError as e:
+            if not options['allow_fallback']:
+                raise
+            self.stderr.write(self.style.WARNING(f'✗ {e}\nFonts not vendored: pages will load them from Google Fonts.'))
+            return
+
+        FONTS_DIR.mkdir(parents=True, exist_ok=True)
+        faces = []
+        total_bytes = 0
+        for family, weight, data in downloads:
+            filename = font_filename(family, weight)
+            (FONTS_DIR / filename).write_bytes(data)
+            total_bytes += len(data)
+            faces.append(
+                '@font-face{'
+                f"font-family:'{family}';font-style:normal;font-weight:{weight};font-display:swap;"
+                f"src:url('../fonts/{filename}') format('woff2')"
+                '}'
+            )
+            self.stdout.write(f'✓ {family} {weight}: {len(data) / 1024:.1f} KB')
+
+        FONTS_CSS.write_text('/* Generated by `manage.py vendor_fonts` - do not edit */\n' + '\n'.join(faces) + '\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Vendored {len(faces)} font files ({total_bytes / 1024:.1f} KB total) into {FONTS_DIR}'
+        ))
+
+    def collect_glyphs(self):
+        """Every character that can appear in a rendered page: templates, view/form/admin copy and Latin-1"""
+        chars = set(string.printable.strip()) | {' '}
+        # Latin-1 and common typographic punctuation: names and emails visitors type are echoed back
+        chars.update(chr(code) for code in range(0xA1, 0x100))
+        chars.update('\u2013\u2014\u2018\u2019\u201c\u201d\u2022\u2026\u20ac\u2122')
+        sources = list((APP_DIR / 'templates').rglob('*.html'))
+        sources += [APP_DIR / name for name in ('views.py', 'forms.py', 'admin.py')]
+        for path in sources:
+            chars.update(ch for ch in path.read_text(encoding='utf-8') if ch.isprintable())
+        return ''.join(sorted(chars))
+
+    def find_woff2_url(self, family, weight, glyphs, timeout):
+        query = urllib.parse.urlencode({'family': f'{family}:wght@{weight}', 'text': glyphs, 'display': 'swap'})
+        css = self.fetch(f'{GOOGLE_FONTS_CSS}?{query}', timeout).decode('utf-8')
+        match = re.search(r"url\((https://[^)]+)\)\s*format\('woff2'\)", css)
+        if not match:
+            raise CommandError(f'No WOFF2 source returned for {family} {weight}')
+        return match.group(1)
+
+    def fetch(self, url, timeout):
+        request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.read()
+        except OSError as e:
+            raise CommandError(f'Failed to download {url}: {e}')
@@ -0,0 +1,106 @@
+"""
+Prometheus metrics, served by the /metrics view.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start:
+each worker then writes its samples to mmap files there and every scrape aggregates all of
+them. Without it (runserver, tests) the metrics live in the default per-process registry.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min
+from django.utils import timezone
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    'aigis_http_request_duration_seconds',
+    'Time to serve a request (streamed responses: until the last byte), by URL name',
+    ['url_name', 'method'],
+)
+SIGNUPS = Counter('aigis_signups', 'Signup form submissions, by outcome', ['outcome'])
+EMAIL_BLOOM_LOOKUPS = Counter(
+    'aigis_email_bloom_lookups',
+    'Email existence checks by Bloom filter answer (negative skips the database query)',
+    ['result'],
+)
+SMTP_SEND_LATENCY = Histogram(
+    'aigis_smtp_send_seconds',
+    'Time to hand one email to the mail backend',
+    ['email_type', 'outcome'],
+)
+DB_CONNECT_LATENCY = Histogram(
+    'aigis_db_connect_seconds',
+    'Time to open a database connection (once per request with conn_max_age=0)',
+    ['alias'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+SLOW_QUERIES = Counter(
+    'aigis_slow_queries',
+    'Queries over SLOW_QUERY_MS, by what ran them (view, command, thread); details in SLOW_QUERY_LOG_PATH',
+    ['source'],
+)
+
+QUEUE_STATS_CACHE_KEY = 'metrics:pending_email_queue'
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """Time the block into histogram; pass outcome=None to have it labelled ok or error"""
+    start = time.perf_counter()
+    if 'outcome' in labels:
+        labels['outcome'] = 'ok'
+    try:
+        yield
+    except Exception:
+        if 'outcome' in labels:
+            labels['outcome'] = 'error'
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+class PendingEmailQueueCollector:
+    """
+    Queue depth and age of the oldest unsent PendingEmail, computed when scraped.
+
+    One indexed aggregate query, cached for METRICS_QUEUE_STATS_SECONDS so a 15 s scrape
+    interval doesn't keep a scale-to-zero database awake on its own.
+    """
+
+    def collect(self):
+        stats = cache.get(QUEUE_STATS_CACHE_KEY)
+        if stats is None:
+            from .db.routers import use_replica
+            from .models import PendingEmail
+            try:
+                with use_replica():
+                    stats = PendingEmail.objects.filter(sent=False).aggregate(depth=Count('id'), oldest=Min('created_at'))
+            except Exception:
+                return  # Database unreachable: skip these series rather than fail the whole scrape
+            cache.set(QUEUE_STATS_CACHE_KEY, stats, settings.METRICS_QUEUE_STATS_SECONDS)
+        age = (timezone.now() - stats['oldest']).total_seconds() if stats['oldest'] else 0
+        yield GaugeMetricFamily('aigis_pending_email_queue_depth', 'Unsent PendingEmail rows', value=stats['depth'])
+        yield GaugeMetricFamily(
+            'aigis_pending_email_oldest_age_seconds',
+            'Age of the oldest unsent PendingEmail row (0 when the queue is empty)',
+            value=age,
+        )
+
+
+_queue_registry = CollectorRegistry()
+_queue_registry.register(PendingEmailQueueCollector())
+
+
+def render():
+    """Exposition-format bytes for every worker's metrics plus the queue gauges"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_queue_registry)
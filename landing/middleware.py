@@ -0,0 +1,301 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import instrumentation, profiling
+from .db import routers, slow_queries
+from .metrics import REQUEST_LATENCY
+
+perf_logger = logging.getLogger('landing.perf')
+
+
+class PerformanceMiddleware:
+    """
+    Per-request timing for a sample of requests (settings.PERF_SAMPLE_RATE).
+
+    Sampled requests get one JSON log line on the landing.perf logger, and a Server-Timing header
+    (db / tpl / hash / app / total) when the viewer may see it (see show_server_timing). Streamed
+    responses send their headers before the body
+    renders, so their header only covers the pre-stream work; the log line is written once the
+    stream finishes and includes it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = instrumentation.RequestTimings()
+        start = time.perf_counter()
+        with self.instrument(timings):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        if self.show_server_timing(request, response):
+            response['Server-Timing'] = self.server_timing(timings, elapsed)
+        if response.streaming:
+            response.streaming_content = self.log_after_stream(request, response, response.streaming_content, timings, start)
+        else:
+            self.log(request, response, timings, elapsed)
+        return response
+
+    @contextmanager
+    def instrument(self, timings):
+        token = instrumentation.activate(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.db_wrapper))
+                yield
+        finally:
+            instrumentation.deactivate(token)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            instrumentation.record('db', time.perf_counter() - start)
+
+    def show_server_timing(self, request, response):
+        # Everyone in DEBUG and on loadtest's throwaway server. Otherwise never on a shared-cacheable
+        # page (the CDN would replay one request's timings to every visitor), and only for staff:
+        # the hash time of an anonymous signup POST is a timing side channel
+        if settings.DEBUG or settings.PERF_SERVER_TIMING_ALL:
+            return True
+        if 'public' in response.get('Cache-Control', ''):
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def server_timing(self, timings, elapsed):
+        total_ms = round(elapsed * 1000, 2)
+        app_ms = round(total_ms - timings.ms('db') - timings.ms('template') - timings.ms('hash'), 2)
+        return ', '.join([
+            f'db;dur={timings.ms("db")};desc="{timings.counts.get("db", 0)} queries"',
+            f'tpl;dur={timings.ms("template")}',
+            f'hash;dur={timings.ms("hash")}',
+            f'app;dur={max(app_ms, 0)}',
+            f'total;dur={total_ms}',
+        ])
+
+    def log_after_stream(self, request, response, content, timings, start):
+        # Re-instrument while the WSGI server pulls the body so DB/template work lands in the timings
+        try:
+            with self.instrument(timings):
+                yield from content
+        finally:
+            self.log(request, response, timings, time.perf_counter() - start)
+
+    def log(self, request, response, timings, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        perf_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'streamed': response.streaming,
+            'total_ms': round(elapsed * 1000, 2),
+            'db_ms': timings.ms('db'),
+            'db_queries': timings.counts.get('db', 0),
+            'template_ms': timings.ms('template'),
+            'hash_ms': timings.ms('hash'),
+        }))
+
+
+class QuerySourceMiddleware:
+    """Labels the slow-query log entries of a request with its view name (landing.db.slow_queries)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.activate(f'path:{request.path}')
+        try:
+            response = self.get_response(request)
+            source = slow_queries.current_source()
+        finally:
+            slow_queries.deactivate(token)
+        if response.streaming:
+            response.streaming_content = self.label_stream(response.streaming_content, source)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.activate(f'view:{request.resolver_match.view_name}')
+
+    def label_stream(self, content, source):
+        # Streamed pages run their queries while the server pulls the body
+        with slow_queries.query_source(source):
+            yield from content
+
+
+class ProfilerMiddleware:
+    """
+    Profiles one request with the sampling profiler (landing.profiling) when it carries a valid
+    `X-Aigis-Profile: <token>` header (from `manage.py profile_token`), or `?_profile=1` from a
+    logged-in staff user (the session cookie only reaches /admin/, so public pages need the
+    header). The response names the file in PROFILE_DIR in an X-Aigis-Profile-File header;
+    streamed pages are sampled until their last byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.requested(request):
+            return self.get_response(request)
+        sampler = profiling.start_sampling()
+        if sampler is None:
+            return self.get_response(request)  # Already profiling something in this process
+
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            sampler.stop()
+            raise
+        label = self.label(request)
+        if response.streaming:
+            response.streaming_content = self.sample_stream(response.streaming_content, sampler, label)
+            return response
+        response[profiling.PROFILE_FILE_HEADER] = self.finish(sampler, label).name
+        return response
+
+    def requested(self, request):
+        token = request.headers.get(profiling.PROFILE_HEADER)
+        if token:
+            return profiling.valid_token(token)
+        if request.GET.get(profiling.PROFILE_QUERY_FLAG):
+            return request.user.is_staff
+        return False
+
+    def label(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return f'request-{match.view_name if match else request.path}'
+
+    def sample_stream(self, content, sampler, label):
+        # The headers are already sent: the file name is only in the log line
+        try:
+            yield from content
+        finally:
+            self.finish(sampler, label)
+
+    def finish(self, sampler, label):
+        sampler.stop()
+        path = sampler.write(label)
+        perf_logger.info(json.dumps({'profile': str(path), 'samples': sampler.samples, 'seconds': round(sampler.seconds, 3)}))
+        return path
+
+
+class MetricsMiddleware:
+    """
+    Observes every request in the aigis_http_request_duration_seconds histogram, labelled with
+    its URL name (all admin pages share `admin`, unresolved paths are `unmatched`).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.observe_after_stream(request, response.streaming_content, start)
+        else:
+            self.observe(request, start)
+        return response
+
+    def observe_after_stream(self, request, content, start):
+        try:
+            yield from content
+        finally:
+            self.observe(request, start)
+
+    def observe(self, request, start):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            url_name = 'unmatched'
+        elif 'admin' in match.namespaces:
+            url_name = 'admin'  # Keeps label cardinality bounded
+        else:
+            url_name = match.url_name or match.view_name
+        REQUEST_LATENCY.labels(url_name, request.method).observe(time.perf_counter() - start)
+
+
+class PublicCacheMiddleware:
+    """
+    Final say on responses marked public by @public_cache. Sits above the session, CSRF and
+    messages middleware so it sees the headers they add:
+
+    - a response that sets any cookie is made private (a shared cache would replay the cookie);
+    - otherwise Vary: Cookie is removed, so the CDN keeps one copy for every visitor instead of
+      one per cookie header (these pages render nothing from cookies).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cache_control = response.get('Cache-Control', '')
+        if 'public' not in cache_control:
+            return response
+        if response.cookies:
+            del response['Cache-Control']
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        if response.has_header('Vary'):
+            vary = [h.strip() for h in response['Vary'].split(',') if h.strip().lower() != 'cookie']
+            del response['Vary']
+            patch_vary_headers(response, vary)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Sends the reads of admin GET/HEAD pages (changelists, filters, analytics) to the read replica
+    when REPLICA_DATABASE_URL is configured; see landing.db.routers.
+
+    Sits below AuthenticationMiddleware and resolves request.user first, so the session and
+    user rows always come from the primary (a replica lagging behind a login would log the
+    admin out). An admin request that writes sets a short-lived cookie that keeps this
+    browser's admin pages on the primary for REPLICA_PIN_SECONDS, so the changelist a save
+    redirects to shows the saved row.
+    """
+
+    PIN_COOKIE = 'aigis_primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.admin_prefix = None
+
+    def __call__(self, request):
+        token = routers.activate()
+        try:
+            if not routers.replica_configured():
+                return self.get_response(request)
+            if self.admin_prefix is None:
+                self.admin_prefix = reverse('admin:index')
+            in_admin = request.path.startswith(self.admin_prefix)
+
+            state = routers.current()
+            if in_admin and request.method in ('GET', 'HEAD') and self.PIN_COOKIE not in request.COOKIES:
+                request.user.is_authenticated  # Load the session and user from the primary
+                state.reads = True
+            response = self.get_response(request)
+            if in_admin and state.wrote:
+                response.set_cookie(
+                    self.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, path=self.admin_prefix,
+                    secure=request.is_secure(), httponly=True, samesite='Lax',
+                )
+            return response
+        finally:
+            routers.deactivate(token)
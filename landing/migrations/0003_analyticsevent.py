@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0002_pendingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('path', models.CharField(blank=True, max_length=255)),
+                ('client_id', models.CharField(blank=True, max_length=64)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['name', 'created_at'], name='landing_ana_name_9a7a23_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -30,4 +32,78 @@ class PendingEmail(models.Model):
         ]
     
     def __str__(self):
-        return f"PendingEmail: {self.email_type} for {self.user.email} (sent={self.sent})"
\ No newline at end of file
+        return f"PendingEmail: {self.email_type} for {self.user.email} (sent={self.sent})"
+
+
+class AnalyticsEvent(models.Model):
+    """Funnel event sent by track() in base.html (written in batches, see landing.buffers)"""
+    name = models.CharField(max_length=64)
+    path = models.CharField(max_length=255, blank=True)
+    client_id = models.CharField(max_length=64, blank=True)  # Random id kept in the visitor's localStorage
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)  # Set when received, not when flushed
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['name', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} on {self.path or '-'} at {self.created_at:%Y-%m-%d %H:%M:%S}"
+
+
+class WaitlistEntry(models.Model):
+    """Footer "Stay in the loop" signup (written in batches, see landing.buffers)"""
+    email = models.EmailField()  # Stored lower-cased
+    source = models.CharField(max_length=255, blank=True)  # Page the form was submitted from
+    created_at = models.DateTimeField(default=timezone.now)
+    promoted_at = models.DateTimeField(null=True, blank=True)  # Set by `manage.py promote_waitlist`
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'waitlist entries'
+        constraints = [
+            # Case-insensitive uniqueness lets bulk_create(ignore_conflicts=True) drop repeat submissions
+            models.UniqueConstraint(Lower('email'), name='landing_waitlist_email_ci_unique'),
+        ]
+
+    def __str__(self):
+        return self.email
+
+
+class Job(models.Model):
+    """Admin bulk action run in resumable chunks by `manage.py run_jobs` (see landing.jobs)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)  # Key in landing.jobs.KINDS
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    cursor = models.BigIntegerField(default=0)  # Highest primary key processed; a resumed job continues after it
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)  # Counted when the job first starts
+    run_seconds = models.FloatField(default=0)  # Time spent in chunks, summed over resumes
+    result_file = models.CharField(max_length=255, blank=True)  # Export output, relative to JOB_RESULTS_DIR
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Bumped by every chunk; stale means the worker died
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.run_seconds if self.run_seconds else None
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.kind} ({self.status})"
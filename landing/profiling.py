@@ -0,0 +1,181 @@
+"""
+On-demand sampling profiler for single requests (ProfilerMiddleware) and management commands
+(`--profile`, see ProfiledCommandMixin).
+
+A background thread samples the profiled thread's Python stack every PROFILE_INTERVAL_MS and
+counts identical stacks, so the cost is a few microseconds per sample in a thread that mostly
+sleeps, not a hook on every function call as with cProfile. Results are written to PROFILE_DIR
+in the collapsed-stack format ("outer;inner;leaf count" per line) that flamegraph.pl and
+speedscope read directly; `manage.py profile_summary` prints the hottest functions.
+
+Only one profile runs at a time per process (a request that asks while another is being
+profiled is served normally), and only the newest PROFILE_KEEP files are kept.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+PROFILE_HEADER = 'X-Aigis-Profile'
+PROFILE_FILE_HEADER = 'X-Aigis-Profile-File'
+PROFILE_QUERY_FLAG = '_profile'
+TOKEN_SALT = 'landing.profiling'
+SUFFIX = '.folded'
+
+_busy = threading.Lock()
+
+
+def make_token():
+    """Signed, timestamped token for the X-Aigis-Profile header (manage.py profile_token)"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def valid_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILE_TOKEN_SECONDS)
+    except signing.BadSignature:  # Includes SignatureExpired
+        return False
+    return value == 'profile'
+
+
+class Sampler:
+    """Counts the stacks of one thread, sampled from a daemon thread"""
+
+    def __init__(self, interval=None):
+        self.interval = (interval if interval is not None else settings.PROFILE_INTERVAL_MS) / 1000
+        self.thread_id = threading.get_ident()
+        self.holds_lock = False
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        if self.holds_lock:
+            self.holds_lock = False
+            _busy.release()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+                self.samples += 1
+
+    def write(self, label):
+        """Write the collapsed stacks to PROFILE_DIR; returns the file's path"""
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '-', label).strip('-')[:80]
+        path = directory / f'{timezone.now():%Y%m%d-%H%M%S}-{slug}-{os.getpid()}{SUFFIX}'
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        prune(directory)
+        return path
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+@lru_cache(maxsize=4096)
+def short_path(filename):
+    for prefix in sorted({str(settings.BASE_DIR), *sys.path}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def prune(directory):
+    profiles = sorted(directory.glob(f'*{SUFFIX}'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for old in profiles[settings.PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+
+
+def start_sampling():
+    """Start sampling the current thread; None if this process is already profiling something"""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        sampler = Sampler()
+        sampler.holds_lock = True
+        return sampler.start()
+    except BaseException:
+        _busy.release()
+        raise
+
+
+def profiles(directory=None):
+    """Profile files, newest first"""
+    directory = Path(directory or settings.PROFILE_DIR)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob(f'*{SUFFIX}'), key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def read_stacks(path):
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return stacks
+
+
+def hot_functions(stacks):
+    """(self samples, total samples) per function: total counts a function once per stack it is on"""
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        self_counts[frames[-1]] += count
+        for name in set(frames):
+            total_counts[name] += count
+    return self_counts, total_counts
+
+
+class ProfiledCommandMixin:
+    """Adds --profile to a management command: samples handle() and writes the profile to PROFILE_DIR"""
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--profile', action='store_true',
+            help='Sample the command with the profiler; summarise the result with manage.py profile_summary',
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        sampler = start_sampling() if options.get('profile') else None
+        if sampler is None:
+            return super().execute(*args, **options)
+        try:
+            return super().execute(*args, **options)
+        finally:
+            sampler.stop()
+            path = sampler.write(f'command-{self.__module__.rsplit(".", 1)[-1]}')
+            self.stderr.write(f'Profile ({sampler.samples} samples over {sampler.seconds:.2f}s) written to {path}')
@@ -0,0 +1,193 @@
+"""
+Local stand-in for an SMTP server, for measuring the email pipeline offline.
+
+Speaks enough SMTP for Django's backends and smtplib (EHLO/HELO, AUTH PLAIN/LOGIN accepting any
+credentials, MAIL, RCPT, DATA, RSET, NOOP, QUIT; no STARTTLS, so run it with EMAIL_USE_TLS=False),
+discards every message and can inject the faults a real provider produces: slow handshakes,
+slow DATA replies, rate limiting, random 4xx/5xx replies and dropped connections.
+
+Run it with `manage.py smtp_sink`, or in-process via SMTPSink.start_in_thread() (email_benchmark).
+"""
+import asyncio
+import base64
+import random
+import threading
+import time
+
+
+class SinkStats:
+    FIELDS = ('connections', 'accepted', 'temp_failed', 'perm_failed', 'rate_limited', 'dropped', 'bytes')
+
+    def __init__(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __str__(self):
+        return ', '.join(f'{field}={value}' for field, value in self.as_dict().items())
+
+
+class SMTPSink:
+    def __init__(self, host='127.0.0.1', port=0, connect_latency=0.0, latency=0.0, jitter=0.0, rate=None,
+                 temp_fail_rate=0.0, perm_fail_rate=0.0, drop_rate=0.0, seed=None):
+        """
+        Latencies are in seconds: connect_latency delays the greeting (a slow TLS/handshake),
+        latency delays each reply to DATA, jitter adds up to that much at random to both. rate
+        caps accepted messages per second (excess MAIL commands get 451). The *_rate arguments
+        are probabilities per message: 451 after DATA, 554 after DATA, connection cut mid-DATA.
+        """
+        self.host = host
+        self.port = port
+        self.connect_latency = connect_latency
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.temp_fail_rate = temp_fail_rate
+        self.perm_fail_rate = perm_fail_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.stats = SinkStats()
+        self._bucket = rate or 0.0
+        self._bucket_at = time.monotonic()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        """Serve from a daemon thread with its own event loop; returns the bound port"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='smtp-sink', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.port
+
+    def stop_thread(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def delay(self, seconds):
+        seconds += self.random.uniform(0, self.jitter) if self.jitter else 0
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def take_token(self):
+        """Token bucket for --rate; False means this message is over the limit"""
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        self._bucket = min(self.rate, self._bucket + (now - self._bucket_at) * self.rate)
+        self._bucket_at = now
+        if self._bucket < 1:
+            return False
+        self._bucket -= 1
+        return True
+
+    async def handle(self, reader, writer):
+        self.stats.connections += 1
+
+        async def reply(line):
+            writer.write(line.encode() + b'\r\n')
+            await writer.drain()
+
+        try:
+            await self.delay(self.connect_latency)
+            await reply('220 aigis-sink ESMTP ready')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                verb, _, arg = line.decode('utf-8', errors='replace').strip().partition(' ')
+                verb = verb.upper()
+                if verb == 'EHLO':
+                    await reply('250-aigis-sink\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SMTPUTF8')
+                elif verb == 'HELO':
+                    await reply('250 aigis-sink')
+                elif verb == 'AUTH':
+                    await self.authenticate(arg, reader, reply)
+                elif verb == 'MAIL':
+                    if self.take_token():
+                        await reply('250 2.1.0 OK')
+                    else:
+                        self.stats.rate_limited += 1
+                        await reply('451 4.7.1 Rate limit exceeded, try again later')
+                elif verb == 'RCPT':
+                    await reply('250 2.1.5 OK')
+                elif verb == 'DATA':
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    if not await self.receive_message(reader, writer, reply):
+                        return
+                elif verb in ('RSET', 'NOOP'):
+                    await reply('250 2.0.0 OK')
+                elif verb == 'QUIT':
+                    await reply('221 2.0.0 Bye')
+                    break
+                else:
+                    await reply('502 5.5.2 Command not implemented')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def authenticate(self, arg, reader, reply):
+        mechanism, _, initial = arg.partition(' ')
+        if mechanism.upper() == 'PLAIN' and not initial:
+            await reply('334 ')
+            await reader.readline()
+        elif mechanism.upper() == 'LOGIN':
+            await reply('334 ' + base64.b64encode(b'Username:').decode())
+            await reader.readline()
+            await reply('334 ' + base64.b64encode(b'Password:').decode())
+            await reader.readline()
+        await reply('235 2.7.0 Authentication successful')
+
+    async def receive_message(self, reader, writer, reply):
+        """Read one DATA payload and answer it; returns False if the connection was dropped"""
+        size = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                return False
+            if line in (b'.\r\n', b'.\n'):
+                break
+            size += len(line)
+        self.stats.bytes += size
+
+        await self.delay(self.latency)
+        roll = self.random.random()
+        if roll < self.drop_rate:
+            self.stats.dropped += 1
+            writer.transport.abort()  # Reset without a reply, like a provider timing out mid-send
+            return False
+        roll -= self.drop_rate
+        if roll < self.temp_fail_rate:
+            self.stats.temp_failed += 1
+            await reply('451 4.3.0 Temporary failure, try again later')
+        elif roll - self.temp_fail_rate < self.perm_fail_rate:
+            self.stats.perm_failed += 1
+            await reply('554 5.7.1 Message rejected')
+        else:
+            self.stats.accepted += 1
+            await reply('250 2.0.0 OK queued')
+        return True
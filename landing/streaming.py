@@ -0,0 +1,103 @@
+"""
+Streaming template rendering.
+
+`render()` builds the whole page before the first byte leaves the server. `stream_render()`
+renders the same template but flushes everything before `{% block content %}` (the <head> with
+its preload hints, plus the header) straight away, then sends each top-level node of the content
+block - the {% cache %}'d sections of index.html - as soon as it has rendered.
+
+It walks the compiled node tree the same way ExtendsNode/BlockNode render it, so template
+inheritance, {% cache %} fragments, context processors and CSRF all behave exactly like render().
+Once the first chunk is sent the status code is fixed, so errors after that point abort the
+response instead of turning into a 500 page.
+"""
+from django.http import StreamingHttpResponse
+from django.template import loader
+from django.template.base import TextNode
+from django.template.context import make_context
+from django.template.loader_tags import BLOCK_CONTEXT_KEY, BlockContext, BlockNode, ExtendsNode
+
+from .instrumentation import timed_iter
+
+# Block whose children are streamed one by one; everything before it goes out in the first chunk
+STREAMED_BLOCK = 'content'
+
+# Marker yielded between chunks that should reach the client separately
+FLUSH = object()
+
+
+def stream_render(request, template_name, context=None, status=None):
+    """Drop-in replacement for render() that returns a StreamingHttpResponse"""
+    template = loader.get_template(template_name).template
+    chunks = timed_iter('template', _buffered(_render_template(template, context or {}, request)))
+    return StreamingHttpResponse(chunks, status=status)
+
+
+def _buffered(pieces):
+    """Join node output between FLUSH markers so the client gets a few sizeable chunks"""
+    buffer = []
+    for piece in pieces:
+        if piece is FLUSH:
+            if buffer:
+                yield ''.join(buffer)
+                buffer = []
+        elif piece:
+            buffer.append(piece)
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _render_template(template, context_dict, request):
+    # Mirrors django.template.backends.django.Template.render + base.Template.render
+    context = make_context(context_dict, request, autoescape=template.engine.autoescape)
+    with context.render_context.push_state(template):
+        with context.bind_template(template):
+            context.template_name = template.name
+            yield from _render_nodelist(template.nodelist, context)
+
+
+def _render_nodelist(nodelist, context):
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            yield from _render_extends(node, context)
+        elif isinstance(node, BlockNode) and node.name == STREAMED_BLOCK:
+            yield FLUSH
+            yield from _render_streamed_block(node, context)
+        else:
+            yield node.render_annotated(context)
+
+
+def _render_extends(node, context):
+    # Mirrors ExtendsNode.render, but renders the parent node by node
+    compiled_parent = node.get_parent(context)
+    if BLOCK_CONTEXT_KEY not in context.render_context:
+        context.render_context[BLOCK_CONTEXT_KEY] = BlockContext()
+    block_context = context.render_context[BLOCK_CONTEXT_KEY]
+    block_context.add_blocks(node.blocks)
+    for parent_node in compiled_parent.nodelist:
+        if not isinstance(parent_node, TextNode):
+            if not isinstance(parent_node, ExtendsNode):
+                blocks = {n.name: n for n in compiled_parent.nodelist.get_nodes_by_type(BlockNode)}
+                block_context.add_blocks(blocks)
+            break
+    with context.render_context.push_state(compiled_parent, isolated_context=False):
+        yield from _render_nodelist(compiled_parent.nodelist, context)
+
+
+def _render_streamed_block(node, context):
+    # Mirrors BlockNode.render, flushing after every non-text child of the block
+    block_context = context.render_context.get(BLOCK_CONTEXT_KEY)
+    with context.push():
+        push = None
+        block = node
+        if block_context is not None:
+            push = block_context.pop(node.name)
+            block = type(node)(node.name, (push or node).nodelist)
+            block.context = context
+        context['block'] = block
+        for child in block.nodelist:
+            yield child.render_annotated(context)
+            if not isinstance(child, TextNode):
+                yield FLUSH
+        if push is not None:
+            block_context.push(node.name, push)
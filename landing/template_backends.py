@@ -0,0 +1,20 @@
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template as BaseTemplate
+
+from .instrumentation import timed
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """Stock Django template backend whose render() time shows up in request timings"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
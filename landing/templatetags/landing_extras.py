@@ -0,0 +1,62 @@
+import secrets
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from landing.decorators import IDEMPOTENCY_FIELD
+
+register = template.Library()
+
+# Fonts needed for the first paint (hero heading + body copy) get a preload hint
+PRELOAD_FONTS = ('landing/fonts/montserrat-700.woff2', 'landing/fonts/roboto-400.woff2')
+FONTS_CSS = 'landing/css/fonts.css'
+# Same families and weights as vendor_fonts.FONTS, for builds that couldn't vendor them
+GOOGLE_FONTS_LINKS = mark_safe(
+    '<link rel="preconnect" href="https://fonts.googleapis.com">\n'
+    '    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>\n'
+    '    <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Montserrat:wght@600;700&amp;family=Roboto:wght@400;500&amp;display=swap">'
+)
+
+
+@lru_cache(maxsize=None)
+def fonts_vendored():
+    """True once `manage.py vendor_fonts` has written the self-hosted fonts"""
+    return all(finders.find(path) for path in (FONTS_CSS,) + PRELOAD_FONTS)
+
+
+@register.simple_tag
+def font_links():
+    """Preload + stylesheet tags for the self-hosted fonts, or the Google Fonts stylesheet until they are vendored"""
+    if not fonts_vendored():
+        return GOOGLE_FONTS_LINKS
+    preloads = format_html_join(
+        '\n    ',
+        '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+        ((static(path),) for path in PRELOAD_FONTS),
+    )
+    return format_html('{}\n    <link rel="stylesheet" href="{}">', preloads, static(FONTS_CSS))
+
+
+@lru_cache(maxsize=None)
+def _read_static_source(path):
+    found = finders.find(path)
+    if not found:
+        raise template.TemplateSyntaxError(f'inline_static: {path!r} not found by the staticfiles finders')
+    with open(found, encoding='utf-8') as f:
+        return f.read()
+
+
+@register.simple_tag
+def inline_static(path):
+    """Contents of a static file, read once per process - used to inline the critical CSS"""
+    return mark_safe(_read_static_source(path))
+
+
+@register.simple_tag
+def idempotency_field():
+    """Hidden input with a fresh key per render, for views decorated with @idempotent_post"""
+    return format_html('<input type="hidden" name="{}" value="{}">', IDEMPOTENCY_FIELD, secrets.token_urlsafe(16))
@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import runpy
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.core.mail import EmailMultiAlternatives
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template import engines
+from django.urls import reverse
+from django.utils import timezone
+
+from .bloom import BloomFilter, email_registry
+from .db.routers import ReplicaRouter, use_replica
+from .db.slow_queries import normalize, query_source, read_log
+from .decorators import public_cache
+from .mail_backends import AsyncSMTPBackend, SMTPPool, _loop_thread, close_idle_sessions
+from .middleware import PublicCacheMiddleware
+from .profiling import PROFILE_FILE_HEADER, make_token
+from .jobs import claim_job, run_job
+from .management.commands import import_users, loadtest
+from .models import AnalyticsEvent, Job, PendingEmail, UserProfile, WaitlistEntry
+from .smtp_sink import SMTPSink
+from .template_loaders import minify
+from .templatetags.landing_extras import FONTS_CSS, GOOGLE_FONTS_LINKS, PRELOAD_FONTS, fonts_vendored
+from .views import event_buffer, signup_breaker, waitlist_buffer
+
+# Roughly production-sized: more users than one admin changelist page holds (100 users / 25 profiles)
+USERS_WITH_PROFILES = 250
+USERS_WITHOUT_PROFILES = 30
+PENDING_EMAILS = 40
+
+# The manifest storage needs collectstatic output, which tests don't have
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES, PERF_SAMPLE_RATE=0)  # No perf log lines in test output
+class QueryBudgetTestCase(TestCase):
+    """
+    Pins how many queries each page, admin screen and command costs.
+
+    The counts must not depend on how many rows the fixture creates; if one of these fails after
+    a change, look for a loop that touches the database before raising the budget.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Password123')  # Hash once; every fixture user shares it
+        cls.admin = User.objects.create(
+            username='admin@example.com', email='admin@example.com', password=password,
+            is_staff=True, is_superuser=True,
+        )
+        users = User.objects.bulk_create([
+            User(username=f'user{i}@example.com', email=f'user{i}@example.com', password=password)
+            for i in range(USERS_WITH_PROFILES + USERS_WITHOUT_PROFILES)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, full_name=f'User {i}', phone='9876543210', shield_limit_percent=5 + i % 16)
+            for i, user in enumerate(users[:USERS_WITH_PROFILES])
+        ])
+        PendingEmail.objects.bulk_create([
+            PendingEmail(user=user, email_type='welcome', email_data={
+                'to': user.email,
+                'subject': 'Welcome to Aigis',
+                'text_content': 'Your 28-day trial is active.',
+                'html_content': '<p>Your 28-day trial is active.</p>',
+            })
+            for user in users[:PENDING_EMAILS]
+        ])
+        # auto_now_add ignores the value passed in; age the queue past the default 2 minute delay
+        PendingEmail.objects.update(created_at=timezone.now() - timedelta(minutes=10))
+
+    def setUp(self):
+        cache.clear()  # Start every test with cold template fragments
+
+
+class PublicPageQueryTests(QueryBudgetTestCase):
+
+    def test_index(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+            content = b''.join(response.streaming_content)  # The page renders while streaming
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'</html>', content)
+
+    def test_signup_get(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('signup'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_signup_post_success(self):
+        data = {
+            'full_name': 'New Trader',
+            'email': 'New.Trader@Example.com',
+            'password': 'Password123',
+            'phone': '9876543210',
+            'shield_limit_percent': 10,
+        }
+        # Existence check, then SAVEPOINT / INSERT user / INSERT profile / RELEASE
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('signup'), data)
+        self.assertRedirects(response, reverse('signup_success'), fetch_redirect_response=False)
+        self.assertTrue(UserProfile.objects.filter(user__username='new.trader@example.com').exists())
+
+    def test_signup_flow_never_touches_sessions(self):
+        data = {
+            'full_name': 'Cookie Only',
+            'email': 'cookie.only@example.com',
+            'password': 'Password123',
+            'phone': '',
+            'shield_limit_percent': 10,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home'))
+            response = self.client.post(reverse('signup'), data, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'django_session' in q['sql']])
+        self.assertIn('messages', self.client.cookies)  # The flash message went to the signed cookie
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_repeated_signup_post_replays_the_redirect(self):
+        data = {
+            'full_name': 'Double Click',
+            'email': 'double.click@example.com',
+            'password': 'Password123',
+            'phone': '',
+            'shield_limit_percent': 10,
+            'idempotency_key': 'k3y-from-one-render',
+        }
+        first = self.client.post(reverse('signup'), data)
+        # No hashing, no queries: the first submit's outcome comes from the cache
+        with self.assertNumQueries(0):
+            repeat = self.client.post(reverse('signup'), data)
+        self.assertRedirects(first, reverse('signup_success'), fetch_redirect_response=False)
+        self.assertRedirects(repeat, reverse('signup_success'), fetch_redirect_response=False)
+        self.assertEqual(User.objects.filter(username='double.click@example.com').count(), 1)
+
+        # A form re-rendered with errors gets a new key, and its old one isn't remembered
+        data.update(email='user1@example.com', idempotency_key='k3y-for-a-duplicate')
+        response = self.client.post(reverse('signup'), data)
+        self.assertContains(response, 'name="idempotency_key"')
+        self.assertNotContains(response, 'k3y-for-a-duplicate')
+        self.assertIsNone(cache.get(f'idempotency:{reverse("signup")}:k3y-for-a-duplicate'))
+
+    def test_signup_post_duplicate(self):
+        data = {
+            'full_name': 'Existing User',
+            'email': 'USER1@example.com',
+            'password': 'Password123',
+            'phone': '',
+            'shield_limit_percent': 10,
+        }
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('signup'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already exists')
+
+
+class BufferedWriteTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for buffer in (event_buffer, waitlist_buffer):
+            # Flushed by the test, not by the background thread from its own connection
+            self.addCleanup(setattr, buffer, 'max_age', buffer.max_age)
+            buffer.max_age = 3600
+            buffer.flush()
+
+    def test_events_are_buffered_then_written_in_one_insert(self):
+        beacon = {'events': [
+            {'event': 'cta_click', 'path': '/', 'client_id': 'c1', 'data': {'section': 'hero'}},
+            {'path': '/no-name'},  # Skipped
+            {'event': 'signup_view', 'path': '/signup/', 'data': 'not an object'},
+        ]}
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('events'), json.dumps(beacon), content_type='application/json')
+            self.client.post(reverse('events'), json.dumps([{'event': 'scroll_50'}] * 60), content_type='application/json')
+        self.assertEqual(response.status_code, 204)
+        with self.assertNumQueries(1):
+            self.assertEqual(event_buffer.flush(), 2 + settings.EVENTS_MAX_BATCH)
+        click = AnalyticsEvent.objects.get(name='cta_click')
+        self.assertEqual((click.path, click.client_id, click.data), ('/', 'c1', {'section': 'hero'}))
+        self.assertEqual(AnalyticsEvent.objects.get(name='signup_view').data, {})
+
+    def test_events_rejects_bad_beacons(self):
+        url = reverse('events')
+        self.assertEqual(self.client.post(url, 'not json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, '{"events": 1}', content_type='application/json').status_code, 400)
+        oversized = json.dumps([{'event': 'x' * settings.EVENTS_MAX_BYTES}])
+        self.assertEqual(self.client.post(url, oversized, content_type='application/json').status_code, 413)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(len(event_buffer), 0)
+
+    def test_waitlist_dedups_in_the_buffer_and_the_database(self):
+        url = reverse('waitlist')
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {'email': 'Fan@Example.com', 'source': '/'}, HTTP_ACCEPT='application/json')
+            self.client.post(url, {'email': 'fan@example.com'})
+            invalid = self.client.post(url, {'email': 'nope'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(waitlist_buffer.flush(), 1)
+        # Submitted again after the flush (or by another worker): the unique index drops it
+        self.client.post(url, {'email': 'FAN@example.com'})
+        waitlist_buffer.flush()
+        self.assertEqual(list(WaitlistEntry.objects.values_list('email', 'source')), [('fan@example.com', '/')])
+
+    def test_promote_waitlist(self):
+        WaitlistEntry.objects.bulk_create([
+            WaitlistEntry(email='fan1@example.com'),
+            WaitlistEntry(email='user1@example.com'),  # Signed up meanwhile
+            WaitlistEntry(email='fan2@example.com'),
+        ])
+        out = StringIO()
+        call_command('promote_waitlist', '--batch-size', 2, stdout=out)
+        self.assertIn('2 accounts created', out.getvalue())
+        self.assertIn('1 already had an account', out.getvalue())
+        user = User.objects.get(username='fan2@example.com')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.profile.full_name, 'fan2')
+        self.assertFalse(WaitlistEntry.objects.filter(promoted_at__isnull=True).exists())
+        # Promoted entries aren't picked up again
+        with self.assertNumQueries(1):
+            call_command('promote_waitlist', stdout=StringIO())
+
+    def test_promote_waitlist_counts_only_accounts_that_exist(self):
+        WaitlistEntry.objects.bulk_create([WaitlistEntry(email='fan1@example.com'), WaitlistEntry(email='fan2@example.com')])
+
+        def insert_all_but_fan2(users, **kwargs):  # As if ignore_conflicts had dropped fan2's row
+            return [user.save() for user in users if user.username != 'fan2@example.com']
+
+        out = StringIO()
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=insert_all_but_fan2):
+            call_command('promote_waitlist', stdout=out)
+        self.assertIn('1 accounts created', out.getvalue())
+        self.assertIn('1 could not get an account', out.getvalue())
+        self.assertEqual(list(WaitlistEntry.objects.filter(promoted_at__isnull=True).values_list('email', flat=True)),
+                         ['fan2@example.com'])
+
+
+class StartupTests(QueryBudgetTestCase):
+
+    def test_gunicorn_config_and_warm_up(self):
+        multiproc_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(multiproc_dir.cleanup)
+        # The config empties PROMETHEUS_MULTIPROC_DIR; point it somewhere disposable
+        self.enterContext(mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': multiproc_dir.name}))
+        os.environ.pop('WEB_CONCURRENCY', None)
+
+        config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        self.assertEqual((config['worker_class'], config['threads'], config['preload_app']), ('gthread', 4, True))
+        self.assertGreaterEqual(config['workers'], 1)
+        self.assertLessEqual(config['workers'], 2 * config['cpu_limit']() + 1)
+        self.assertEqual(config['max_requests_jitter'], config['max_requests'] // 10)
+
+        email_registry.reset()
+        self.addCleanup(email_registry.reset)
+        config['warm_up']()
+        self.assertTrue(email_registry.ready)
+        with self.assertNumQueries(0):  # The filter is built before the first request needs it
+            self.client.get(reverse('check_email'), {'email': 'brand.new@example.com'})
+
+    def test_ensure_superuser(self):
+        out = StringIO()
+        call_command('ensure_superuser', '--migrate', stdout=out)
+        self.assertIn('No migrations to apply.', out.getvalue())  # post_migrate isn't run for nothing
+        self.assertIn('Superuser already exists', out.getvalue())
+
+        User.objects.filter(is_superuser=True).delete()
+        call_command('ensure_superuser', '--username', 'user1@example.com', stdout=out)
+        self.assertIn('Superuser username already exists: user1@example.com', out.getvalue())
+        self.assertFalse(User.objects.filter(is_superuser=True).exists())
+        call_command('ensure_superuser', '--username', 'root', '--email', 'root@example.com', stdout=out)
+        self.assertTrue(User.objects.get(username='root').is_superuser)
+
+    def test_startup_profile(self):
+        out = StringIO()
+        call_command('startup_profile', '--skip-server', '--json', '--top', 5, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['imports']['total_import_ms'], 0)
+        self.assertLessEqual(len(report['imports']['by_package']), 5)
+        self.assertIn('landing', [app[0] for app in report['setup']['apps']])
+        self.assertNotIn('cold_start', report)
+
+
+class AdminQueryTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    # Admin budgets exclude the session read: cached_db sessions come from the cache
+
+    def test_user_changelist(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('admin:auth_user_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'No profile')  # Users without a profile are still listed
+
+    def test_profile_changelist(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('admin:landing_userprofile_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_selected_profiles(self):
+        # The action only queues a job: the selected ids and one INSERT, however many rows
+        ids = list(UserProfile.objects.values_list('id', flat=True)[:100])
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('admin:landing_userprofile_changelist'), {
+                'action': 'export_selected_profiles',
+                '_selected_action': ids,
+            })
+        self.assertEqual(response.status_code, 302)
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.status, len(job.params['profile_ids'])), ('export_profiles', Job.QUEUED, len(ids)))
+
+
+class CommandQueryTests(QueryBudgetTestCase):
+
+    def test_clear_users(self):
+        # Counts, the profile DELETE, then the deletion collector: one SELECT, one DELETE (or SET NULL
+        # UPDATE) per related table and one DELETE per 100 users (the only term that grows with the fixture)
+        with self.assertNumQueries(14):
+            call_command('clear_users', '--confirm', stdout=StringIO())
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['admin@example.com'])
+
+    def test_delete_user(self):
+        with self.assertNumQueries(13):
+            call_command('delete_user', 'user1@example.com', '--confirm', stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='user1@example.com').exists())
+
+    def test_send_welcome_emails(self):
+        # One SELECT for the batch and one UPDATE per chunk for the outcome, however many are in it
+        with self.assertNumQueries(1 + PENDING_EMAILS // 20):
+            call_command('send_welcome_emails', '--limit', PENDING_EMAILS, '--chunk-size', 20, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), PENDING_EMAILS)
+        self.assertFalse(PendingEmail.objects.filter(sent=False).exists())
+
+    def test_send_welcome_emails_fails_an_unbuildable_row_alone(self):
+        broken = PendingEmail.objects.order_by('created_at', 'pk').first()
+        PendingEmail.objects.filter(pk=broken.pk).update(email_data={'to': broken.email_data['to']})  # No subject
+        call_command('send_welcome_emails', '--limit', PENDING_EMAILS, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), PENDING_EMAILS - 1)
+        broken.refresh_from_db()
+        self.assertEqual((broken.sent, broken.attempts), (False, 1))
+        self.assertEqual(PendingEmail.objects.filter(sent=True).count(), PENDING_EMAILS - 1)
+
+
+class ImportUsersTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.csv_path = os.path.join(directory.name, 'users.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write(
+                'full_name,email,password,phone,shield_limit_percent\n'
+                'New One,new1@example.com,Password123,,12\n'
+                'New Two,NEW2@example.com,Password123,9876543210,\n'
+                'Again,new1@example.com,Password123,,\n'  # Duplicate in the file
+                'Weak,weak@example.com,weak,,\n'
+                'Racer,race@example.com,Password123,,\n'
+                'New Three,new3@example.com,Password123,,\n'
+                'Existing,User1@Example.com,Password123,,\n'  # Already has an account
+            )
+
+    def test_dedups_and_inserts_in_chunks(self):
+        out = StringIO()
+        call_command('import_users', self.csv_path, '--batch-size', 2, '--workers', 1, stdout=out)
+        self.assertIn('4 users created', out.getvalue())
+        self.assertIn('1 already had an account', out.getvalue())
+        self.assertIn('1 duplicate emails', out.getvalue())
+        self.assertIn('1 invalid rows', out.getvalue())
+        profile = UserProfile.objects.get(user__username='new2@example.com')
+        self.assertEqual((profile.full_name, profile.shield_limit_percent), ('New Two', 10))
+        self.assertTrue(profile.user.check_password('Password123'))
+        self.assertEqual(User.objects.filter(username__in=['new1@example.com', 'new3@example.com', 'race@example.com']).count(), 3)
+        self.assertEqual(User.objects.filter(username='user1@example.com').count(), 1)
+
+    def test_signup_racing_the_insert_is_skipped(self):
+        class RacedImport(import_users.Command):
+            def existing_emails(self, emails):
+                existing = super().existing_emails(emails)
+                if 'race@example.com' in emails and not User.objects.filter(username='race@example.com').exists():
+                    # A signup lands between the existence check and the insert
+                    User.objects.create(username='race@example.com', email='race@example.com')
+                return existing
+
+        out = StringIO()
+        call_command(RacedImport(), self.csv_path, '--batch-size', 2, '--workers', 1, stdout=out)
+        self.assertIn('signed up during the import', out.getvalue())
+        self.assertIn('3 users created', out.getvalue())
+        self.assertTrue(User.objects.filter(username='new3@example.com').exists())  # In the racer's batch
+        self.assertFalse(UserProfile.objects.filter(user__username='race@example.com').exists())
+
+
+class JobTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        results_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(results_dir.cleanup)
+        results_override = override_settings(JOB_RESULTS_DIR=results_dir.name)
+        results_override.enable()
+        self.addCleanup(results_override.disable)
+
+    def test_export_job_resumes_and_downloads(self):
+        ids = list(UserProfile.objects.values_list('id', flat=True))
+        job = Job.objects.create(kind='export_profiles', params={'profile_ids': ids})
+        chunks = []
+        # Stop after two chunks, as a SIGTERM would, then leave a torn write behind the committed offset
+        job = run_job(claim_job(), chunk_size=40, should_stop=lambda: len(chunks) == 2, on_chunk=chunks.append)
+        self.assertEqual((job.status, job.processed), (Job.QUEUED, 80))
+        with open(os.path.join(settings.JOB_RESULTS_DIR, job.result_file), 'a') as f:
+            f.write('half a row')
+
+        call_command('run_jobs', '--once', '--chunk-size', 40, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.total), (Job.DONE, len(ids), len(ids)))
+        self.assertIsNotNone(job.rows_per_second)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:landing_job_download', args=[job.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(ids) + 1)
+        self.assertEqual(len(set(lines)), len(lines))
+        self.assertNotIn('half a row', lines[-1])
+
+    def test_delete_orphaned_users_job(self):
+        Job.objects.create(kind='delete_orphaned_users')
+        call_command('run_jobs', '--once', '--chunk-size', 7, stdout=StringIO())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        self.assertFalse(User.objects.filter(is_superuser=False, profile__isnull=True).exists())
+        self.assertEqual(UserProfile.objects.count(), USERS_WITH_PROFILES)
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsQueryTests(QueryBudgetTestCase):
+
+    def scrape(self):
+        return self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+
+    def test_scrape(self):
+        # The queue gauges cost one aggregate query, then come from the cache until it expires
+        with self.assertNumQueries(1):
+            response = self.scrape()
+        with self.assertNumQueries(0):
+            self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'aigis_pending_email_queue_depth {float(PENDING_EMAILS)}')
+        self.assertContains(response, 'aigis_http_request_duration_seconds_bucket')
+
+    def test_scrape_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class EmailBloomTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        email_registry.build()
+        self.addCleanup(email_registry.reset)
+
+    def test_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        emails = [f'trader{i}@example.com' for i in range(1000)]
+        for email in emails:
+            bloom.add(email)
+        self.assertTrue(all(email in bloom for email in emails))
+        false_positives = sum(f'other{i}@example.com' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)  # ~1% expected
+
+    @override_settings(EMAIL_BLOOM_CAPACITY=1)
+    def test_build_leaves_headroom_for_new_signups(self):
+        email_registry.build()
+        built_at = email_registry._built_at
+        self.assertEqual(email_registry._filter.count, User.objects.count())  # One key per account
+        email_registry.add('one.more@example.com')
+        User.objects.create(username='one.more@example.com', email='one.more@example.com')
+        with self.assertNumQueries(1):  # Just the pk > last-seen query, no rebuild scan
+            email_registry.refresh()
+        self.assertEqual(email_registry._built_at, built_at)
+
+    def test_refresh_catches_rows_that_commit_below_the_last_seen_pk(self):
+        late = User.objects.create(username='late.import@example.com', email='late.import@example.com')
+        early = User.objects.create(username='early.signup@example.com', email='early.signup@example.com')
+        # A refresh ran between the two commits: it saw the signup's pk but not the import's lower one
+        email_registry.add(early.username)
+        email_registry._max_pk = early.pk
+        self.assertNotIn(late.username, email_registry._filter)
+        email_registry.refresh()
+        self.assertTrue(email_registry.might_exist('Late.Import@example.com'))
+        self.assertEqual(email_registry._max_pk, early.pk)
+
+    def test_new_email_signup_skips_existence_check(self):
+        data = {
+            'full_name': 'New Trader',
+            'email': 'new.trader@example.com',
+            'password': 'Password123',
+            'phone': '',
+            'shield_limit_percent': 10,
+        }
+        # SAVEPOINT / INSERT user / INSERT profile / RELEASE
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('signup'), data)
+        self.assertRedirects(response, reverse('signup_success'), fetch_redirect_response=False)
+        self.assertTrue(email_registry.might_exist('New.Trader@example.com'))
+
+    def test_check_email(self):
+        url = reverse('check_email')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'email': 'brand.new@example.com'})
+        self.assertEqual(response.json(), {'valid': True, 'available': True})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'email': 'USER1@example.com'})
+        self.assertEqual(response.json(), {'valid': True, 'available': False})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'email': 'not-an-email'})
+        self.assertEqual(response.json(), {'valid': False, 'available': None})
+
+
+class SlowQueryLogTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.log_path = os.path.join(log_dir.name, 'slow.jsonl')
+        log_override = override_settings(SLOW_QUERY_MS=0.000001, SLOW_QUERY_LOG_PATH=self.log_path)
+        log_override.enable()
+        self.addCleanup(log_override.disable)
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x''y' AND b IN (1, 2, 3)\n  LIMIT 21"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?',
+        )
+
+    def test_same_query_shape_shares_a_fingerprint(self):
+        with query_source('view:test'):
+            User.objects.filter(pk__in=[1, 2, 3]).count()
+            User.objects.filter(pk__in=[4, 5]).count()
+        entries = [e for e in read_log(self.log_path) if 'COUNT' in e['sql']]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['fingerprint'], entries[1]['fingerprint'])
+        self.assertEqual(entries[0]['source'], 'view:test')
+
+        out = StringIO()
+        call_command('slow_queries', path=self.log_path, stdout=out)
+        self.assertIn(entries[0]['fingerprint'], out.getvalue())
+        self.assertIn('view:test (2)', out.getvalue())
+
+    def test_requests_are_labelled_with_their_view(self):
+        self.client.get(reverse('check_email'), {'email': 'user1@example.com'})
+        self.assertIn('view:check_email', {e['source'] for e in read_log(self.log_path)})
+
+
+class ProfilerTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.profile_dir = profile_dir.name
+        profile_override = override_settings(PROFILE_DIR=self.profile_dir, PROFILE_INTERVAL_MS=0.5)
+        profile_override.enable()
+        self.addCleanup(profile_override.disable)
+
+    def test_signed_header_profiles_one_request(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('signup'), headers={'X-Aigis-Profile': make_token()})
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, response[PROFILE_FILE_HEADER])))
+
+        response = self.client.get(reverse('signup'), headers={'X-Aigis-Profile': 'profile:forged:token'})
+        self.assertNotIn(PROFILE_FILE_HEADER, response)
+        response = self.client.get(reverse('signup'), {'_profile': '1'})  # Not staff
+        self.assertNotIn(PROFILE_FILE_HEADER, response)
+
+    def test_command_profile_and_summary(self):
+        err = StringIO()
+        call_command('delete_user', 'user1@example.com', profile=True, stdout=StringIO(), stderr=err)
+        self.assertIn('written to', err.getvalue())
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+        out = StringIO()
+        call_command('profile_summary', stdout=out)
+        self.assertIn('command-delete_user', out.getvalue())
+
+
+class DegradedSignupTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        journal_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(journal_dir.cleanup)
+        self.journal_path = os.path.join(journal_dir.name, 'signups.jsonl')
+        journal_override = override_settings(SIGNUP_JOURNAL_PATH=self.journal_path)
+        journal_override.enable()
+        self.addCleanup(journal_override.disable)
+        # Trip the breaker as consecutive database failures would
+        for _ in range(settings.SIGNUP_BREAKER_FAILURES):
+            signup_breaker.record_failure()
+        self.addCleanup(signup_breaker.reset)
+
+    def signup(self, email):
+        return self.client.post(reverse('signup'), {
+            'full_name': 'Offline Trader',
+            'email': email,
+            'password': 'Password123',
+            'phone': '',
+            'shield_limit_percent': 12,
+        })
+
+    def test_open_breaker_journals_without_touching_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.signup('offline@example.com')
+        self.assertRedirects(response, reverse('signup_success'), fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(username='offline@example.com').exists())
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_invalid_probe_does_not_leave_the_breaker_half_open(self):
+        signup_breaker._opened_at -= signup_breaker.reset_timeout  # Due for a probe
+        response = self.client.post(reverse('signup'), {
+            'full_name': 'Offline Trader', 'email': 'weak@example.com', 'password': 'weak', 'shield_limit_percent': 12,
+        })
+        self.assertEqual(response.status_code, 200)  # Rejected before reaching the database
+        self.assertNotEqual(signup_breaker.state, 'half-open')
+
+        self.signup('probe@example.com')  # The next signup is the probe, and is written
+        self.assertEqual(signup_breaker.state, 'closed')
+        self.assertTrue(User.objects.filter(username='probe@example.com').exists())
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_replay_creates_accounts_and_skips_duplicates(self):
+        self.signup('offline@example.com')
+        self.signup('Offline@Example.com')  # Submitted twice during the outage
+        self.signup('user1@example.com')  # Already had an account
+        call_command('replay_signup_journal', stdout=StringIO())
+
+        user = User.objects.get(username='offline@example.com')
+        self.assertTrue(user.check_password('Password123'))
+        self.assertEqual(user.profile.shield_limit_percent, 12)
+        self.assertEqual(User.objects.filter(username='user1@example.com').count(), 1)
+        self.assertFalse(os.path.exists(self.journal_path + '.replaying'))
+        # Replaying again is a no-op
+        with self.assertNumQueries(0):
+            call_command('replay_signup_journal', stdout=StringIO())
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class ServerTimingTests(QueryBudgetTestCase):
+
+    def test_only_staff_see_server_timing(self):
+        response = self.client.post(reverse('signup'), {'full_name': 'A', 'email': 'a@example.com', 'password': 'x'})
+        self.assertFalse(response.has_header('Server-Timing'))  # Its hash time is a timing side channel
+        self.client.force_login(self.admin)
+        self.assertIn('db;dur=', self.client.get(reverse('admin:index'))['Server-Timing'])
+        # Never on a page the CDN shares between visitors
+        self.assertFalse(self.client.get(reverse('privacy')).has_header('Server-Timing'))
+
+
+@override_settings(STORAGES=TEST_STORAGES, PERF_SAMPLE_RATE=0)
+class CacheHeaderTests(TestCase):
+
+    def test_public_pages_are_shared_cacheable(self):
+        self.client.cookies['messages'] = 'pending'  # Cookies the page doesn't use must not split the cache
+        for name in ('home', 'privacy', 'terms'):
+            response = self.client.get(reverse(name))
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('stale-while-revalidate=', response['Cache-Control'])
+            self.assertNotIn('Cookie', response.get('Vary', ''))
+            self.assertFalse(response.cookies)
+
+    def test_index_and_static_files_are_long_cached_and_compressed(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        # The production storage (the class-level override swaps in the plain one)
+        storages = {**TEST_STORAGES, 'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root.name, STORAGES=storages):
+            call_command('collectstatic', '--noinput', verbosity=0)
+            client = Client()  # A new handler: WhiteNoise indexes STATIC_ROOT when it is created
+            response = client.get(reverse('home'))
+            self.assertIn('max-age=', response['Cache-Control'])
+            html = b''.join(response.streaming_content).decode()
+            stylesheet = re.search(r'href="(/static/landing/css/base\.[0-9a-f]{12}\.css)"', html)
+            self.assertIsNotNone(stylesheet)  # The hashed name from the manifest
+
+            response = client.get(stylesheet.group(1), HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('max-age=315360000', response['Cache-Control'])
+            self.assertIn(response['Content-Encoding'], ('gzip', 'br'))
+            self.assertIn('Accept-Encoding', response['Vary'])
+            response.close()
+
+    def test_signup_is_private(self):
+        response = self.client.get(reverse('signup'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_public_response_setting_a_cookie_is_made_private(self):
+        def view(request):
+            response = HttpResponse('hello')
+            response.set_cookie('tracking', '1')
+            return response
+
+        response = PublicCacheMiddleware(public_cache(view))(RequestFactory().get('/'))
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BaseTemplateTests(SimpleTestCase):
+
+    def setUp(self):
+        fonts_vendored.cache_clear()
+        self.addCleanup(fonts_vendored.cache_clear)
+
+    def render(self, source):
+        return engines.all()[0].from_string('{% load landing_extras %}' + source).render()
+
+    def test_font_links_fall_back_to_google_fonts_until_vendored(self):
+        # Not found by any finder, like a checkout where vendor_fonts hasn't run (or couldn't reach Google)
+        with mock.patch('landing.templatetags.landing_extras.finders.find', return_value=None):
+            self.assertEqual(self.render('{% font_links %}'), GOOGLE_FONTS_LINKS)
+
+    def test_font_links_use_vendored_fonts(self):
+        static_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(static_dir.cleanup)
+        for path in (FONTS_CSS,) + PRELOAD_FONTS:
+            os.makedirs(os.path.join(static_dir.name, os.path.dirname(path)), exist_ok=True)
+            open(os.path.join(static_dir.name, path), 'w').close()
+        with override_settings(STATICFILES_DIRS=[static_dir.name]):
+            html = self.render('{% font_links %}')
+        self.assertNotIn('fonts.googleapis.com', html)
+        self.assertIn('<link rel="stylesheet" href="/static/landing/css/fonts.css">', html)
+        for path in PRELOAD_FONTS:
+            self.assertIn(f'<link rel="preload" href="/static/{path}" as="font" type="font/woff2" crossorigin>', html)
+
+    def test_base_inlines_critical_css_and_defers_the_stylesheet(self):
+        html = engines.all()[0].get_template('landing/base.html').render()
+        head = html.split('</head>', 1)[0]
+        with open(finders.find('landing/css/critical.css'), encoding='utf-8') as f:
+            self.assertIn(f'<style>{f.read()}</style>', head)
+        self.assertIn(
+            '<link rel="preload" href="/static/landing/css/base.css" as="style" '
+            'onload="this.onload=null;this.rel=\'stylesheet\'">', head,
+        )
+        # Without JavaScript the preload never becomes a stylesheet; the fallback must still be there
+        self.assertIn('<noscript><link rel="stylesheet" href="/static/landing/css/base.css"></noscript>', head)
+
+
+class PaintBenchmarkTests(SimpleTestCase):
+
+    def test_baseline_report_is_diffed(self):
+        before = {'url': 'http://before/', 'runs': 1, 'critical_path': {'ttfb_ms': 40.0, 'render_blocking_stylesheets': 2}}
+        after = {'ttfb_ms': 30.0, 'render_blocking_stylesheets': 0, 'html_bytes': 1000}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(before, f)
+        self.addCleanup(os.remove, f.name)
+
+        out = StringIO()
+        with mock.patch('landing.management.commands.paint_benchmark.Command.measure_critical_path', return_value=after):
+            call_command('paint_benchmark', 'http://after/', '--http-only', '--runs', 1, '--baseline', f.name, '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['baseline'], 'http://before/')
+        self.assertEqual(report['diff']['ttfb_ms'], {'before': 40.0, 'after': 30.0, 'change': -10.0, 'change_pct': -25.0})
+        self.assertEqual(report['diff']['render_blocking_stylesheets']['change'], -2.0)
+        self.assertNotIn('html_bytes', report['diff'])  # Not in the baseline
+
+
+class LoadTestTests(SimpleTestCase):
+    """Runs the real command: migrate, collectstatic and gunicorn against a throwaway SQLite database"""
+
+    def test_loadtest_report(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        output = os.path.join(workdir.name, 'loadtest.json')
+        out = StringIO()
+        call_command('loadtest', '--requests', 3, '--post-requests', 2, '--concurrency', 2, '--gunicorn-workers', 1,
+                     '--output', output, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        with open(output) as f:
+            self.assertEqual(json.load(f), report)
+        self.assertEqual(report['config']['database'], 'sqlite')
+        self.assertEqual(set(report['endpoints']), {'GET /', 'GET /signup/', 'POST /signup/'})
+        for endpoint, stats in report['endpoints'].items():
+            self.assertEqual(stats['errors'], 0, endpoint)
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            # Query counts come from the Server-Timing header every response carries in the run
+            self.assertIsInstance(stats['db_queries_max'], int, endpoint)
+            self.assertLessEqual(stats['db_queries_median'], stats['db_queries_max'])
+        self.assertGreater(report['endpoints']['POST /signup/']['db_queries_max'], 0)
+
+        # A later run is compared against the stored report
+        report['endpoints']['GET /']['p95_ms'] *= 2
+        report['endpoints']['GET /']['db_queries_max'] += 1
+        regressions = loadtest.Command().compare(report, output, 0.25)
+        self.assertEqual([line.split(':')[0] for line in regressions], ['GET /', 'GET /'])
+
+
+@override_settings(EMAIL_POOL_SIZE=4)
+class AsyncSMTPBackendTests(SimpleTestCase):
+    """Against the in-process SMTP sink, not a mock"""
+
+    def start_sink(self, **faults):
+        sink = SMTPSink(**faults)
+        port = sink.start_in_thread()
+        self.addCleanup(sink.stop_thread)
+        self.addCleanup(close_idle_sessions)
+        return sink, AsyncSMTPBackend(host=sink.host, port=port, use_tls=False, use_ssl=False)
+
+    def messages(self, count, connection):
+        for i in range(count):
+            msg = EmailMultiAlternatives('Welcome', 'text', 'Aigis <noreply@example.com>', [f'user{i}@example.com'],
+                                         connection=connection)
+            msg.attach_alternative('<p>html</p>', 'text/html')
+            yield msg
+
+    def test_sends_concurrently_over_a_reused_pool(self):
+        sink, backend = self.start_sink(latency=0.05)
+        self.assertEqual(backend.send_messages(list(self.messages(12, backend))), 12)
+        self.assertEqual(backend.send_messages(list(self.messages(4, backend))), 4)
+        self.assertEqual(sink.stats.accepted, 16)
+        self.assertEqual(sink.stats.connections, 4)
+
+    def test_refusals_are_reported_per_message(self):
+        sink, backend = self.start_sink(perm_fail_rate=1)
+        results = backend.send_each(self.messages(3, backend))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(error is not None for error, _ in results))
+        with self.assertRaises(Exception):
+            next(self.messages(1, backend)).send()
+        backend.fail_silently = True
+        self.assertEqual(next(self.messages(1, backend)).send(), 0)
+
+    def test_sink_rate_limits_and_drops(self):
+        sink, backend = self.start_sink(rate=2)
+        results = backend.send_each(self.messages(6, backend))
+        self.assertEqual(sum(error is None for error, _ in results), sink.stats.accepted)
+        self.assertGreaterEqual(sink.stats.rate_limited, 3)  # A burst of 6 against a bucket of 2 per second
+
+        sink, backend = self.start_sink(drop_rate=1)
+        self.assertTrue(all(error is not None for error, _ in backend.send_each(self.messages(2, backend))))
+        self.assertEqual((sink.stats.dropped, sink.stats.accepted), (2, 0))
+
+    def test_timeouts_are_per_message_and_cancel_the_send(self):
+        async def send(pool, message):
+            if message.to == ['user1@example.com']:
+                await asyncio.sleep(5)
+            return None, 0.0
+
+        backend = AsyncSMTPBackend(host='127.0.0.1', port=1, timeout=0.1)
+        with mock.patch.object(SMTPPool, 'send', send):
+            results = backend.send_each(self.messages(3, backend))
+        self.assertEqual([type(error) for error, _ in results], [type(None), TimeoutError, type(None)])
+
+        finished = []
+
+        async def slow(pool):
+            await asyncio.sleep(0.3)
+            finished.append(True)
+
+        with self.assertRaises(TimeoutError):
+            _loop_thread.run(slow, 'slow', {'size': 1, 'idle_timeout': 1}, timeout=0.05)
+        time.sleep(0.5)
+        self.assertEqual(finished, [])  # Cancelled, not left running after the caller gave up
+
+
+class EmailBenchmarkTests(QueryBudgetTestCase):
+
+    def test_email_benchmark_drains_through_sink_faults(self):
+        out = StringIO()
+        call_command(
+            'email_benchmark', '--emails', 30, '--batch-size', 10, '--temp-fail-rate', 0.3, '--seed', 7,
+            '--backend', 'landing.mail_backends.AsyncSMTPBackend', '--json', '--i-know-this-is-production', stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['sent'], report['unsent']), (30, 0))
+        self.assertGreater(report['sink']['temp_failed'], 0)
+        self.assertGreater(report['runs'], 3)  # Temporary failures were retried by later runs
+        self.assertEqual(report['sink']['accepted'], 30)
+        # The fixture's queue was never touched and the benchmark rows were deleted
+        self.assertEqual(PendingEmail.objects.filter(sent=False).count(), PENDING_EMAILS)
+        self.assertEqual(PendingEmail.objects.filter(attempts=0).count(), PendingEmail.objects.count())
+        self.assertFalse(User.objects.filter(username__startswith='email-benchmark-').exists())
+
+    def test_email_benchmark_refuses_without_debug(self):
+        with self.assertRaisesMessage(CommandError, '--i-know-this-is-production'):
+            call_command('email_benchmark', '--emails', 1, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='email-benchmark-').exists())
+
+
+class TemplateMinifyTests(SimpleTestCase):
+
+    def test_minify(self):
+        cell = '<td style="padding:4px 8px;border-bottom:1px solid rgba(255,255,255,.04)">{{ x }}</td>'
+        source = (
+            '<html><head>\n  <!-- note -->\n</head><body>\n\n'
+            f'{cell * 5}'
+            '<pre>  keep\n  this</pre><script>if(a  <  b){}  // x\n</script></body></html>'
+        )
+        minified, stats = minify(source)
+        self.assertNotIn('note', minified)
+        self.assertIn('<pre>  keep\n  this</pre><script>if(a  <  b){}  // x\n</script>', minified)
+        self.assertEqual(minified.count(cell), 5)  # Inline styles stay inline: the cascade is unchanged
+        self.assertLess(stats.minified, stats.original)
+
+    @override_settings(STORAGES=TEST_STORAGES, PERF_SAMPLE_RATE=1)
+    def test_template_report_keeps_request_timing_out_of_its_output(self):
+        out = StringIO()
+        with self.assertNoLogs('landing.perf'):
+            call_command('template_report', stdout=out)
+        self.assertIn('bytes saved over 5 pages', out.getvalue())
+
+    def test_only_landing_templates_are_minified(self):
+        loader = engines.all()[0].engine.template_loaders[0].loaders[0]
+        self.assertTrue(loader.minifies('landing/index.html'))
+        self.assertFalse(loader.minifies('admin/base.html'))
+        admin_origin = next(loader.get_template_sources('admin/base.html'))
+        self.assertEqual(loader.get_contents(admin_origin), admin_origin.source_loader.get_contents(admin_origin))
+
+
+class ReplicaRouterTests(SimpleTestCase):
+
+    def test_reads_use_the_replica_until_something_is_written(self):
+        router = ReplicaRouter()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # Overriding DATABASES warns; the router only looks at the aliases
+            with override_settings(DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']}):
+                self.assertEqual(router.db_for_read(UserProfile), 'default')
+                with use_replica():
+                    self.assertEqual(router.db_for_read(UserProfile), 'replica')
+                    self.assertEqual(router.db_for_write(UserProfile), 'default')
+                    self.assertEqual(router.db_for_read(UserProfile), 'default')  # Read-your-writes
+                with use_replica():
+                    self.assertEqual(router.db_for_read(UserProfile), 'replica')
+
+    def test_without_a_replica_everything_uses_default(self):
+        with use_replica():
+            self.assertEqual(ReplicaRouter().db_for_read(UserProfile), 'default')
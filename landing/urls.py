@@ -4,9 +4,13 @@ from . import views
 urlpatterns = [
     path("", views.index, name="home"),
     path("signup/", views.signup, name="signup"),
+    path("signup/check-email/", views.check_email, name="check_email"),
     path("signup/success/", views.signup_success, name="signup_success"),
     path("privacy/", views.privacy, name="privacy"),
     path("terms/", views.terms, name="terms"),
+    path("events/", views.events, name="events"),
+    path("waitlist/", views.waitlist, name="waitlist"),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
 
 
@@ -1,13 +1,67 @@
+import json
+import logging
+
+from prometheus_client import CONTENT_TYPE_LATEST
 from django.shortcuts import render, redirect
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.contrib import messages
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.db import transaction
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.template.loader import render_to_string
-from .forms import SignupForm
-from .models import UserProfile
+from .forms import SignupForm, WaitlistForm
+from .bloom import email_registry
+from .breaker import CircuitBreaker
+from .buffers import BufferedWriter
+from .decorators import idempotent_post, public_cache
+from .emails import send_pending_emails
+from .journal import SignupJournal, replay_in_background
+from . import metrics
+from .metrics import SIGNUPS
+from .models import UserProfile, AnalyticsEvent, WaitlistEntry
+from .streaming import stream_render
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "the database isn't there" (suspended Neon, network), as opposed to bad data
+DATABASE_UNAVAILABLE = (OperationalError, InterfaceError)
+
+# Degraded-mode signup: while the database is failing, signups go to a durable local journal
+# (landing/journal.py) and are replayed into User/UserProfile once the breaker closes again
+signup_journal = SignupJournal()
+signup_breaker = CircuitBreaker(
+    failure_threshold=settings.SIGNUP_BREAKER_FAILURES,
+    reset_timeout=settings.SIGNUP_BREAKER_RESET_SECONDS,
+    on_close=lambda: replay_in_background(signup_journal),
+)
+
+# Funnel events are batched per worker and written with one bulk_create per flush
+event_buffer = BufferedWriter(
+    AnalyticsEvent,
+    max_size=settings.EVENTS_BUFFER_SIZE,
+    max_age=settings.EVENTS_FLUSH_SECONDS,
+)
+
+# Waitlist emails are deduped in the buffer and again by the case-insensitive unique index
+waitlist_buffer = BufferedWriter(
+    WaitlistEntry,
+    max_size=settings.WAITLIST_BUFFER_SIZE,
+    max_age=settings.WAITLIST_FLUSH_SECONDS,
+    key=lambda entry: entry.email,
+    ignore_conflicts=True,
+)
 
+
+@public_cache
 def index(request):
     # Storytelling context for the landing page (hero, problem, solution, transformation, founder)
     # Hero punch line (kept concise for conversion testing)
@@ -119,15 +173,28 @@ def index(request):
         "arjun": arjun,
         "whatif": whatif,
         "pmo": pmo,
+        # Static sections of index.html are wrapped in {% cache %} fragments
+        "fragment_cache_seconds": settings.TEMPLATE_FRAGMENT_CACHE_SECONDS,
     }
-    return render(request, "landing/index.html", context)
+    # Stream the page so the browser gets <head> (and its preload hints) before the body renders
+    return stream_render(request, "landing/index.html", context)
 
 
+@never_cache  # Renders a CSRF token and per-visitor form errors
+@idempotent_post  # A double-clicked or retried submit gets the first one's redirect, no rehash
 def signup(request):
+    probe = False
     try:
         if request.method == "POST":
-            form = SignupForm(request.POST)
-            if form.is_valid():
+            # With the breaker open the database is skipped entirely, existence check included
+            database_up = signup_breaker.allow()
+            probe = database_up and signup_breaker.state == 'half-open'
+            form = SignupForm(request.POST, check_existing=database_up)
+            valid = form.is_valid()
+            if form.database_reached:
+                # The existence query answered, so the database is back whatever the form says
+                signup_breaker.record_success()
+            if valid:
                 user = None
                 try:
                     email = form.cleaned_data["email"].lower()
@@ -136,44 +203,68 @@ def signup(request):
                     phone = form.cleaned_data["phone"]
                     shield = form.cleaned_data["shield_limit_percent"]
 
-                    # Use transaction with timeout handling
-                    with transaction.atomic():
-                        # Check if user already exists (this will wake up Neon if sleeping)
-                        if User.objects.filter(username=email).exists() or User.objects.filter(email=email).exists():
-                            form.add_error('email', 'An account with this email already exists. Please use a different email or try logging in.')
-                            return render(request, "landing/signup.html", {"form": form})
-
-                        user = User.objects.create_user(username=email, email=email, password=password)
-                        UserProfile.objects.create(user=user, full_name=full_name, phone=phone, shield_limit_percent=shield)
+                    # SignupForm.clean_email already checked for an existing account; a signup racing
+                    # this one is caught by the unique username below. Hash before opening the
+                    # transaction so the write lock isn't held for the PBKDF2 rounds.
+                    hashed_password = make_password(password)
+                    if isinstance(form.database_error, DATABASE_UNAVAILABLE):
+                        raise form.database_error  # Don't wait out a second connect timeout
+                    if database_up:
+                        with transaction.atomic():
+                            user = User.objects.create(username=email, email=email, password=hashed_password)
+                            UserProfile.objects.create(user=user, full_name=full_name, phone=phone, shield_limit_percent=shield)
+                        signup_breaker.record_success()
+                        email_registry.add(email)
+                except DATABASE_UNAVAILABLE as db_error:
+                    logger.warning(f"Database unavailable during signup, journaling it: {db_error}")
+                    signup_breaker.record_failure()
+                    database_up = False
                 except Exception as db_error:
                     # Catch database constraint errors (duplicate username/email)
                     error_msg = str(db_error)
                     if 'duplicate key' in error_msg.lower() or 'already exists' in error_msg.lower() or 'unique constraint' in error_msg.lower():
+                        signup_breaker.record_success()  # The database answered, with a constraint error
+                        SIGNUPS.labels('duplicate').inc()
                         form.add_error('email', 'An account with this email already exists. Please use a different email or try logging in.')
                         return render(request, "landing/signup.html", {"form": form})
                     else:
                         # Re-raise other database errors to be caught by outer exception handler
                         raise
 
+                if not database_up:
+                    # Degraded mode: durably queued (fsync'd) for replay_signup_journal, and the
+                    # user gets the same answer as a normal signup
+                    signup_journal.append({
+                        "email": email,
+                        "password": hashed_password,
+                        "full_name": full_name,
+                        "phone": phone,
+                        "shield_limit_percent": shield,
+                        "created_at": timezone.now().isoformat(),
+                    })
+                    SIGNUPS.labels('journaled').inc()
+                    messages.success(request, "Your 28-day trial is active!")
+                    return redirect("signup_success")
+
                 # If user creation failed, don't proceed
                 if not user:
                     form.add_error(None, 'Failed to create account. Please try again.')
                     return render(request, "landing/signup.html", {"form": form})
 
+                SIGNUPS.labels('success').inc()
                 messages.success(request, "Your 28-day trial is active!")
                 return redirect("signup_success")
             else:
                 # Form is invalid, render with errors
+                SIGNUPS.labels('duplicate' if form.has_error('email', 'duplicate') else 'invalid').inc()
                 return render(request, "landing/signup.html", {"form": form})
         else:
             form = SignupForm()
             return render(request, "landing/signup.html", {"form": form})
     except Exception as e:
         # Log the error for debugging
-        import logging
-        import traceback
-        logger = logging.getLogger(__name__)
         logger.error(f"Error in signup view: {e}", exc_info=True)
+        SIGNUPS.labels('error').inc()
         
         # Check if it's a database connection error
         error_msg = str(e).lower()
@@ -187,6 +278,31 @@ def signup(request):
         messages.error(request, "An error occurred during signup. Please try again or contact support.")
         form = SignupForm()
         return render(request, "landing/signup.html", {"form": form})
+    finally:
+        if probe:
+            # A probe that got no database outcome (invalid form, unexpected error) lets the next
+            # request probe instead of leaving the breaker half-open; no-op once an outcome was recorded
+            signup_breaker.release()
+
+
+@never_cache
+def check_email(request):
+    """Live availability check for the signup form; brand-new emails are answered from memory"""
+    email = request.GET.get('email', '').strip().lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        return JsonResponse({'valid': False, 'available': None})
+    if not email_registry.might_exist(email):
+        return JsonResponse({'valid': True, 'available': True})
+    if signup_breaker.state == 'open':
+        return JsonResponse({'valid': True, 'available': None})
+    try:
+        exists = User.objects.filter(Q(username=email) | Q(email=email)).exists()
+    except DATABASE_UNAVAILABLE:
+        # Unknown rather than wrong: the form's own check (or the journal) decides on submit
+        return JsonResponse({'valid': True, 'available': None})
+    return JsonResponse({'valid': True, 'available': not exists})
 
 
 def signup_success(request):
@@ -197,6 +313,7 @@ def process_emails(request):
     """API endpoint to process pending emails - called by JavaScript timer"""
     from django.http import JsonResponse
     from landing.models import PendingEmail
+    from django.db.models import F
     from django.utils import timezone
     from datetime import timedelta
     
@@ -208,46 +325,16 @@ def process_emails(request):
             created_at__lte=cutoff_time
         ).order_by('created_at')[:10]  # Process max 10 at a time
         
-        sent_count = 0
-        failed_count = 0
-        
-        for pending_email in pending_emails:
-            try:
-                email_data = pending_email.email_data
-                
-                if pending_email.email_type == 'welcome':
-                    # Send welcome email to user
-                    msg = EmailMultiAlternatives(
-                        subject=email_data['subject'],
-                        body=email_data['text_content'],
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[email_data['to']],
-                    )
-                    msg.attach_alternative(email_data['html_content'], "text/html")
-                    msg.send(fail_silently=True)
-                    
-                elif pending_email.email_type == 'admin_notification':
-                    # Send admin notification
-                    send_mail(
-                        subject=email_data['subject'],
-                        message=email_data['message'],
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[email_data['to']],
-                        fail_silently=True,
-                    )
-                
-                # Mark as sent
-                pending_email.sent = True
-                pending_email.sent_at = timezone.now()
-                pending_email.save()
-                sent_count += 1
-                
-            except Exception:
-                # If email fails, don't break - will retry later
-                pending_email.attempts += 1
-                pending_email.save()
-                failed_count += 1
-                pass
+        results = send_pending_emails(pending_emails)
+        sent_ids = [pending_email.id for pending_email, error in results if error is None]
+        failed_ids = [pending_email.id for pending_email, error in results if error is not None]
+        # Failed emails aren't marked sent - will retry later
+        if sent_ids:
+            PendingEmail.objects.filter(id__in=sent_ids).update(sent=True, sent_at=timezone.now())
+        if failed_ids:
+            PendingEmail.objects.filter(id__in=failed_ids).update(attempts=F('attempts') + 1)
+        sent_count = len(sent_ids)
+        failed_count = len(failed_ids)
         
         return JsonResponse({
             'success': True,
@@ -263,9 +350,71 @@ def process_emails(request):
         }, status=500)
 
 
+@public_cache
 def privacy(request):
     return render(request, "landing/privacy.html")
 
 
+@public_cache
 def terms(request):
     return render(request, "landing/terms.html")
+
+
+@csrf_exempt
+@require_POST
+def events(request):
+    """Batched analytics beacon from track() in base.html - buffered in memory, never written inline"""
+    if len(request.body) > settings.EVENTS_MAX_BYTES:
+        return HttpResponse(status=413)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return HttpResponseBadRequest('Invalid JSON')
+    batch = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(batch, list):
+        return HttpResponseBadRequest('Expected a list of events')
+
+    received_at = timezone.now()
+    for event in batch[:settings.EVENTS_MAX_BATCH]:
+        if not isinstance(event, dict) or not event.get('event'):
+            continue
+        data = event.get('data')
+        event_buffer.add(AnalyticsEvent(
+            name=str(event['event'])[:64],
+            path=str(event.get('path') or '')[:255],
+            client_id=str(event.get('client_id') or '')[:64],
+            data=data if isinstance(data, dict) else {},
+            created_at=received_at,
+        ))
+    return HttpResponse(status=204)
+
+
+@csrf_exempt
+@require_POST
+def waitlist(request):
+    """Footer waitlist form - validated and buffered in memory, no DB round trip per submit"""
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+    form = WaitlistForm(request.POST)
+    if not form.is_valid():
+        if wants_json:
+            return JsonResponse({'success': False, 'error': form.errors['email'][0]}, status=400)
+        return redirect("home")
+
+    waitlist_buffer.add(WaitlistEntry(
+        email=form.cleaned_data['email'],
+        source=request.POST.get('source', '')[:255],
+        created_at=timezone.now(),
+    ))
+    if wants_json:
+        return JsonResponse({'success': True})
+    return redirect("home")
+
+
+def metrics_view(request):
+    """Prometheus scrape target; needs `Authorization: Bearer <METRICS_TOKEN>`, and is closed without one unless DEBUG"""
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)  # Not configured: signup counts and latencies aren't public
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE_LATEST)
@@ -12,14 +12,15 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
-import dj_database_url
-from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Load environment variables from .env file
-load_dotenv(BASE_DIR / '.env')
+# Load environment variables from .env file (local development; Render sets real env vars,
+# so python-dotenv isn't even imported there)
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
 
 
 # Quick-start development settings - unsuitable for production
@@ -49,10 +50,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'landing.middleware.MetricsMiddleware',  # Prometheus request latency per URL name
+    'landing.middleware.PerformanceMiddleware',  # Server-Timing + JSON perf log (after WhiteNoise: static files skip it)
+    'landing.middleware.QuerySourceMiddleware',  # Names the view in slow-query log entries
+    'landing.middleware.PublicCacheMiddleware',  # Above session/CSRF/messages: drops Vary: Cookie from @public_cache pages
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'landing.middleware.ProfilerMiddleware',  # Samples requests with a signed X-Aigis-Profile header (needs request.user for ?_profile=1)
+    'landing.middleware.ReplicaMiddleware',  # Admin GET pages read from REPLICA_DATABASE_URL, if set
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,10 +68,22 @@ ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock Django backend that reports render time to PerformanceMiddleware
+        'BACKEND': 'landing.template_backends.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
+        # Loaders are listed explicitly (instead of APP_DIRS) so the cached
+        # loader stays on regardless of DEBUG - templates compile once per process,
+        # landing/ ones minified (landing.template_loaders) on the way in
+        'APP_DIRS': False,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    ('landing.template_loaders.Loader', [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ]),
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -82,12 +101,13 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 
 # Use PostgreSQL if DATABASE_URL is set (production), otherwise use SQLite (local)
 if os.environ.get('DATABASE_URL'):
+    import dj_database_url
     db_config = dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
         conn_max_age=0  # Neon closes idle connections, so don't reuse them
     )
     # Ensure we use PostgreSQL backend (works with both psycopg2 and psycopg3)
-    db_config['ENGINE'] = 'django.db.backends.postgresql'
+    db_config['ENGINE'] = 'landing.db.postgresql'  # django.db.backends.postgresql + connect timing
     # Add SSL requirement for Neon
     db_config.setdefault('OPTIONS', {})['sslmode'] = 'require'
     # Add connection timeout settings for Neon (to handle suspended computes)
@@ -98,11 +118,87 @@ if os.environ.get('DATABASE_URL'):
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'ENGINE': 'landing.db.sqlite3',  # django.db.backends.sqlite3 + connect timing
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            # Take the write lock at BEGIN and wait for it, so concurrent local requests queue instead of failing
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 
+# Optional read replica (e.g. a Neon read replica endpoint). Admin list pages, the profile CSV export
+# and the metrics queue stats read from it; signups, every write and every read after a write in the
+# same request stay on default (landing/db/routers.py). Without it everything uses default.
+if os.environ.get('REPLICA_DATABASE_URL'):
+    import dj_database_url
+    replica_config = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'], conn_max_age=0)
+    replica_config['ENGINE'] = 'landing.db.postgresql'
+    replica_config.setdefault('OPTIONS', {}).update(sslmode='require', connect_timeout='10')
+    replica_config['TEST'] = {'MIRROR': 'default'}
+    DATABASES['replica'] = replica_config
+
+DATABASE_ROUTERS = ['landing.db.routers.ReplicaRouter']
+
+# How long admin pages stay on the primary after an admin request wrote something (replication lag)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+
+
+# Cache (used for {% cache %} template fragments)
+# Per-process memory cache by default; set CACHE_BACKEND/CACHE_LOCATION to share it between workers.
+# The key prefix changes on every Render deploy so stale fragments are never served.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'aigis'),
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', os.environ.get('RENDER_GIT_COMMIT', '')[:12]),
+    }
+}
+
+# Strip comments and whitespace from the landing/ .html templates when they are loaded
+# (landing/template_loaders.py); False serves the source as written
+TEMPLATE_MINIFY = os.environ.get('TEMPLATE_MINIFY', 'True') == 'True'
+
+# Lifetime of the static landing page fragments cached in index.html
+TEMPLATE_FRAGMENT_CACHE_SECONDS = int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_SECONDS', '3600'))
+
+# @idempotent_post (signup): how long a submitted form's outcome is remembered, and how long a
+# repeat waits for the first submit to finish before handling the POST itself
+IDEMPOTENCY_SECONDS = int(os.environ.get('IDEMPOTENCY_SECONDS', '600'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '5'))
+
+
+# Sessions and messages
+# Only the admin logs in, so the session cookie is scoped to /admin/ (and renamed, so browsers
+# still holding an old site-wide `sessionid` don't send it to public pages). Public pages and
+# the signup redirect never load or save a session; flash messages live in a signed cookie.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_COOKIE_NAME = 'aigis_admin_session'
+SESSION_COOKIE_PATH = '/admin/'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# HTTP caching of the public pages (@public_cache): browsers and the CDN treat them as fresh for
+# PUBLIC_CACHE_SECONDS, then may serve a stale copy for PUBLIC_CACHE_STALE_SECONDS while refetching
+
+PUBLIC_CACHE_SECONDS = int(os.environ.get('PUBLIC_CACHE_SECONDS', '300'))
+PUBLIC_CACHE_STALE_SECONDS = int(os.environ.get('PUBLIC_CACHE_STALE_SECONDS', '86400'))
+
+
+# Password hashing
+# Same PBKDF2 algorithm as Django's default, timed for PerformanceMiddleware
+
+PASSWORD_HASHERS = [
+    'landing.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,8 +235,16 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+# Hashed + compressed static files; WhiteNoise serves hashed names with a far-future immutable Cache-Control
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -148,13 +252,19 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Email Configuration
-EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+# Non-blocking: sends run on a per-process asyncio loop over a pool of persistent SMTP sessions
+# (landing/mail_backends.py); set django.core.mail.backends.smtp.EmailBackend to go back to smtplib
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'landing.mail_backends.AsyncSMTPBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'pvarad2022@gmail.com')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', 'zklrtkprlbrjrpvv')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Aigis <pvarad2022@gmail.com>')
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
+# AsyncSMTPBackend: concurrent sessions per process, and how long an idle one is trusted before reconnecting
+EMAIL_POOL_SIZE = int(os.environ.get('EMAIL_POOL_SIZE', '8'))
+EMAIL_POOL_IDLE_SECONDS = int(os.environ.get('EMAIL_POOL_IDLE_SECONDS', '60'))
 
 # Email to receive notifications when someone signs up
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'pvarad2022@gmail.com')
@@ -165,4 +275,103 @@ ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'pvarad2022@gmail.com')
 # 3. Replace 'YOUR_GMAIL_APP_PASSWORD' above with the generated app password (16 characters)
 # 
 # If you want to test without SMTP (emails print to console), change EMAIL_BACKEND to:
-# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+
+# Analytics events (POST /events/ from track() in base.html)
+# Buffered per worker and flushed with bulk_create when EVENTS_BUFFER_SIZE rows are pending
+# or the oldest is EVENTS_FLUSH_SECONDS old
+
+EVENTS_BUFFER_SIZE = int(os.environ.get('EVENTS_BUFFER_SIZE', '200'))
+EVENTS_FLUSH_SECONDS = float(os.environ.get('EVENTS_FLUSH_SECONDS', '5'))
+EVENTS_MAX_BATCH = 50  # Events accepted per beacon
+EVENTS_MAX_BYTES = 16 * 1024
+
+
+# Waitlist capture (POST /waitlist/ from the footer form), buffered like analytics events
+
+WAITLIST_BUFFER_SIZE = int(os.environ.get('WAITLIST_BUFFER_SIZE', '500'))
+WAITLIST_FLUSH_SECONDS = float(os.environ.get('WAITLIST_FLUSH_SECONDS', '2'))
+
+
+# Degraded-mode signup (landing/journal.py): after SIGNUP_BREAKER_FAILURES database errors in a row
+# the signup view stops trying the database for SIGNUP_BREAKER_RESET_SECONDS and appends signups,
+# password already hashed, to SIGNUP_JOURNAL_PATH instead. Put it on a disk that outlives the process;
+# `manage.py replay_signup_journal` (run by start.sh) drains it once the database is back
+SIGNUP_BREAKER_FAILURES = int(os.environ.get('SIGNUP_BREAKER_FAILURES', '2'))
+SIGNUP_BREAKER_RESET_SECONDS = float(os.environ.get('SIGNUP_BREAKER_RESET_SECONDS', '15'))
+SIGNUP_JOURNAL_PATH = os.environ.get('SIGNUP_JOURNAL_PATH', str(BASE_DIR / 'var' / 'signup-journal.jsonl'))
+
+
+# Email existence Bloom filter (landing/bloom.py), one per process, built at gunicorn boot.
+# Sized for EMAIL_BLOOM_CAPACITY emails (or twice the current accounts) at EMAIL_BLOOM_ERROR_RATE;
+# ~120 KB at the defaults. While requests arrive, new users are picked up every
+# EMAIL_BLOOM_REFRESH_SECONDS (re-reading the EMAIL_BLOOM_REFRESH_OVERLAP pks below the highest
+# seen, for transactions that commit late) and the filter is rebuilt every
+# EMAIL_BLOOM_REBUILD_SECONDS to forget deleted accounts
+EMAIL_BLOOM_CAPACITY = int(os.environ.get('EMAIL_BLOOM_CAPACITY', '100000'))
+EMAIL_BLOOM_ERROR_RATE = float(os.environ.get('EMAIL_BLOOM_ERROR_RATE', '0.01'))
+EMAIL_BLOOM_REFRESH_SECONDS = float(os.environ.get('EMAIL_BLOOM_REFRESH_SECONDS', '30'))
+EMAIL_BLOOM_REBUILD_SECONDS = float(os.environ.get('EMAIL_BLOOM_REBUILD_SECONDS', '3600'))
+EMAIL_BLOOM_REFRESH_OVERLAP = int(os.environ.get('EMAIL_BLOOM_REFRESH_OVERLAP', '2000'))
+
+
+# Background jobs for admin bulk actions (landing/jobs.py, run by `manage.py run_jobs`)
+# Exports are written to JOB_RESULTS_DIR and downloaded from the job's admin page, so the worker
+# must share this directory with the web process (start.sh runs it in the same container)
+JOB_RESULTS_DIR = os.environ.get('JOB_RESULTS_DIR', str(BASE_DIR / 'var' / 'jobs'))
+JOB_CHUNK_SIZE = int(os.environ.get('JOB_CHUNK_SIZE', '500'))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '300'))  # A running job this quiet is resumed elsewhere
+
+
+# Performance instrumentation
+# Fraction of requests that get a JSON line on the landing.perf logger, and a Server-Timing header
+# if the viewer is staff (or DEBUG is on); PERF_SERVER_TIMING_ALL sends the header to everyone
+
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '1.0' if DEBUG else '0.1'))
+PERF_SERVER_TIMING_ALL = os.environ.get('PERF_SERVER_TIMING_ALL', 'False') == 'True'
+
+# Slow-query log (landing/db/slow_queries.py): queries slower than SLOW_QUERY_MS (0 turns it off) are
+# appended to SLOW_QUERY_LOG_PATH, with an EXPLAIN plan on PostgreSQL the first time each query shape
+# is seen by a process. `manage.py slow_queries` summarises the file
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'True') == 'True'
+SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH', str(BASE_DIR / 'var' / 'slow-queries.jsonl'))
+
+# On-demand profiling (landing/profiling.py): requests with an X-Aigis-Profile header from
+# `manage.py profile_token` (valid PROFILE_TOKEN_SECONDS) and commands run with --profile are
+# sampled every PROFILE_INTERVAL_MS into PROFILE_DIR, which keeps the newest PROFILE_KEEP files
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'var' / 'profiles'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_TOKEN_SECONDS = int(os.environ.get('PROFILE_TOKEN_SECONDS', '3600'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+
+# Prometheus metrics at /metrics (see landing.metrics); set PROMETHEUS_MULTIPROC_DIR under gunicorn.
+# The scraper must send METRICS_TOKEN as "Authorization: Bearer <token>"; without one /metrics is
+# a 404 (open only with DEBUG on).
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_QUEUE_STATS_SECONDS = int(os.environ.get('METRICS_QUEUE_STATS_SECONDS', '60'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_line',
+        },
+    },
+    'loggers': {
+        'landing.perf': {
+            'handlers': ['perf_console'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
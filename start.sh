@@ -1,28 +1,49 @@
 #!/usr/bin/env bash
 set -e
 
-# Run migrations
-python manage.py migrate --noinput
+# Apply pending migrations and create the admin superuser if missing, in one Django process
+# (migrate is skipped entirely when there is nothing to apply)
+python manage.py ensure_superuser --migrate
 
-# Create superuser if it doesn't exist
-python manage.py shell << EOF
-from django.contrib.auth import get_user_model
-User = get_user_model()
-if not User.objects.filter(is_superuser=True).exists():
-    username = 'admin'
-    email = 'pvarad2022@gmail.com'
-    password = 'aigis2025admin'
-    if not User.objects.filter(username=username).exists():
-        User.objects.create_superuser(username=username, email=email, password=password)
-        print('Superuser created successfully!')
-        print(f'Username: {username}')
-        print(f'Password: {password}')
-    else:
-        print('Superuser username already exists')
-else:
-    print('Superuser already exists')
-EOF
+# Create accounts for signups journaled while the database was unreachable (no-op when there are none)
+python manage.py replay_signup_journal || echo "Signup journal replay failed; the journal is kept for the next run"
 
-# Start Gunicorn
-exec gunicorn mysite.wsgi --bind 0.0.0.0:${PORT:-10000}
+# Worker for the admin's bulk-action jobs, in this container so its CSV exports land on the
+# disk the web process serves them from. Restarted if it crashes; on SIGTERM it re-queues the
+# job in flight and exits 0, which ends the loop.
+supervise_run_jobs() {
+    stopping=
+    trap 'stopping=1; kill -TERM "$worker_pid" 2>/dev/null' TERM
+    while [ -z "$stopping" ]; do
+        python manage.py run_jobs &
+        worker_pid=$!
+        while kill -0 "$worker_pid" 2>/dev/null; do
+            wait "$worker_pid"
+            status=$?
+        done
+        if [ "$status" -eq 0 ]; then
+            return 0
+        fi
+        echo "run_jobs exited with status $status; restarting in 5s"
+        sleep 5
+    done
+}
 
+set +e
+supervise_run_jobs &
+jobs_pid=$!
+
+# Gunicorn (workers, threads, bind address and preload come from gunicorn.conf.py). Not exec'd:
+# this shell stays in front to pass the platform's SIGTERM on to both processes.
+gunicorn mysite.wsgi &
+web_pid=$!
+
+trap 'kill -TERM "$web_pid" "$jobs_pid" 2>/dev/null' TERM INT
+# wait returns early when a trapped signal arrives, so wait until gunicorn is really gone
+while kill -0 "$web_pid" 2>/dev/null; do
+    wait "$web_pid"
+    status=$?
+done
+kill -TERM "$jobs_pid" 2>/dev/null  # Gunicorn exited on its own: stop the worker too
+wait "$jobs_pid"
+exit "$status"